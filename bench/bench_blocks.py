@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from corpus import CorpusGenerator
+from mdblock import (
+    block_to_block_type,
+    block_to_block_type_chained,
+    create_mdblock,
+    markdown_to_blocks
+)
+
+LIST_HEAVY_MIX = {"heading": 1, "paragraph": 1, "ulist": 3, "olist": 3}
+
+
+def make_list(generator, kind, items):
+    if kind == "ulist":
+        return "\n".join(f"* {generator.inline_text(8)}" for _ in range(items))
+    return "\n".join(f"{i}. {generator.inline_text(8)}" for i in range(1, items + 1))
+
+
+def best(function, number, repeat):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block classifier benchmark on list-heavy documents")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, the best one is reported")
+    parser.add_argument("--pages", type=int, default=50, help="List-heavy pages for the document benchmark")
+    args = parser.parse_args()
+    generator = CorpusGenerator(seed=0)
+
+    print(f"{'block':>6} {'items':>6} {'chained us':>11} {'single us':>10} {'speedup':>8}")
+    for kind in ("ulist", "olist"):
+        for items in (5, 50, 500):
+            block = make_list(generator, kind, items)
+            assert block_to_block_type(block) == block_to_block_type_chained(block)
+            number = max(1, 5000 // items)
+            chained = best(lambda: block_to_block_type_chained(block), number, args.repeat)
+            single = best(lambda: block_to_block_type(block), number, args.repeat)
+            print(f"{kind:>6} {items:>6} {chained * 1e6:>11.2f} {single * 1e6:>10.2f} {chained / single:>7.2f}x")
+
+    generator = CorpusGenerator(seed=0, mix=LIST_HEAVY_MIX)
+    blocks = [block for _ in range(args.pages) for block in markdown_to_blocks(generator.page(30))]
+    chained = best(lambda: [block_to_block_type_chained(block) for block in blocks], 1, args.repeat)
+    single = best(lambda: [block_to_block_type(block) for block in blocks], 1, args.repeat)
+    parse = best(lambda: [create_mdblock(block) for block in blocks], 1, args.repeat)
+    print(f"\n{args.pages} list-heavy pages, {len(blocks)} blocks")
+    print(f"classify chained {chained * 1000:>9.3f} ms")
+    print(f"classify single  {single * 1000:>9.3f} ms ({chained / single:.2f}x)")
+    print(f"create_mdblock   {parse * 1000:>9.3f} ms (classification is now {single / parse:.1%} of it)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from textnode import (
+    text_to_textnodes,
+    text_to_textnodes_multipass
+)
+
+SENTENCES = [
+    "This is **bolded** text with an *italic* word and some `inline code`. ",
+    "Read the [documentation](https://example.com/docs) before you start. ",
+    "Here is a picture ![rivendell](/images/rivendell.png) of the valley. ",
+    "A plain sentence without any inline markup at all, just words. ",
+]
+
+
+def make_paragraph(sentences):
+    return "".join(SENTENCES[i % len(SENTENCES)] for i in range(sentences))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inline tokenizer benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, the best one is reported")
+    args = parser.parse_args()
+
+    print(f"{'sentences':>10} {'chars':>8} {'multipass ms':>13} {'single ms':>10} {'speedup':>8}")
+    for sentences in (10, 100, 1000, 5000):
+        paragraph = make_paragraph(sentences)
+        assert text_to_textnodes(paragraph) == text_to_textnodes_multipass(paragraph)
+        number = max(1, 2000 // sentences)
+        multipass = min(timeit.repeat(lambda: text_to_textnodes_multipass(paragraph), number=number, repeat=args.repeat)) / number
+        single = min(timeit.repeat(lambda: text_to_textnodes(paragraph), number=number, repeat=args.repeat)) / number
+        print(f"{sentences:>10} {len(paragraph):>8} {multipass * 1000:>13.3f} {single * 1000:>10.3f} {multipass / single:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
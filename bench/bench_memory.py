@@ -0,0 +1,121 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from bench_inline import make_paragraph
+import mdblock
+from htmlnode import LeafNode
+from mdblock import (
+    create_mdblock,
+    generate_page,
+    markdown_to_blocks
+)
+from textnode import (
+    TextNode,
+    TextType
+)
+
+
+class DictTextNode:  # TextNode as it was before __slots__, for comparison
+
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictLeafNode:  # LeafNode as it was before __slots__, with its own props dict
+
+    def __init__(self, tag_str=None, value_str=None, props=None):
+        self.tag = tag_str
+        self.value = value_str
+        self.children = None
+        self.props = props if props is not None else {}
+
+
+def bytes_per_object(factory, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the objects is not part of the node cost
+    return (after - before - sys.getsizeof(objects)) / len(objects)
+
+
+def make_document(blocks):
+    parts = []
+    for i in range(blocks):
+        match i % 4:
+            case 0:
+                parts.append(f"## Section {i}")
+            case 1:
+                parts.append(make_paragraph(8))
+            case 2:
+                parts.append("\n".join(f"* item *{j}* with `code`" for j in range(6)))
+            case 3:
+                parts.append("\n".join(f"{j}. step [{j}](https://example.com/{j})" for j in range(1, 6)))
+    return "\n\n".join(parts)
+
+
+def peak_parse_memory(markdown):
+    tracemalloc.start()
+    blocks = [create_mdblock(block) for block in markdown_to_blocks(markdown)]
+    html_nodes = [block.to_html_node() for block in blocks]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, len(html_nodes)
+
+
+def peak_page_memory(markdown, streamed):
+    # Peak memory of generate_page for a document, read from and written to disk
+    work_dir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(work_dir, "index.md")
+        template = os.path.join(work_dir, "template.html")
+        with open(source, 'w') as source_file:
+            source_file.write(markdown)
+        with open(template, 'w') as template_file:
+            template_file.write("<title>{{ Title }}</title>{{ Content }}")
+        mdblock.STREAM_MIN_BYTES = 0 if streamed else len(markdown) + 1
+        tracemalloc.start()
+        generate_page(source, template, os.path.join(work_dir, "index.html"))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(work_dir)
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Node memory benchmark")
+    parser.add_argument("--count", type=int, default=100000, help="Nodes allocated per measurement")
+    parser.add_argument("--blocks", type=int, default=4000, help="Blocks in the parsed document")
+    args = parser.parse_args()
+
+    text = "some text"
+    rows = [
+        ("TextNode", lambda i: TextNode(text, TextType.TEXT), lambda i: DictTextNode(text, TextType.TEXT)),
+        ("LeafNode", lambda i: LeafNode("b", text), lambda i: DictLeafNode("b", text)),
+    ]
+    print(f"{'node':>10} {'__dict__ B':>11} {'__slots__ B':>12} {'saved':>7}")
+    for name, slotted, with_dict in rows:
+        old = bytes_per_object(with_dict, args.count)
+        new = bytes_per_object(slotted, args.count)
+        print(f"{name:>10} {old:>11.1f} {new:>12.1f} {1 - new / old:>6.0%}")
+
+    markdown = make_document(args.blocks)
+    peak, blocks = peak_parse_memory(markdown)
+    print(f"Parsing {len(markdown)} chars into {blocks} blocks peaks at {peak / 1e6:.1f} MB")
+    in_memory = peak_page_memory(markdown, streamed=False)
+    streamed = peak_page_memory(markdown, streamed=True)
+    print(f"Generating its page peaks at {in_memory / 1e6:.1f} MB in memory, {streamed / 1e6:.2f} MB streamed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from corpus import (
+    parse_mix,
+    write_corpus
+)
+from mdblock import (
+    block_to_block_type,
+    create_mdblock,
+    extract_title,
+    markdown_to_blocks,
+    mdstrip
+)
+from htmlnode import ParentNode
+from template import Template
+from textnode import text_to_textnodes
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "template.html")
+STAGES = ["read", "markdown_to_blocks", "create_mdblock", "text_to_textnodes", "to_html_node", "to_html", "template_fill", "write"]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def inline_texts(block):
+    # The strings create_mdblock hands to text_to_textnodes for this block
+    stripped = mdstrip(block, block_to_block_type(block))
+    return stripped if isinstance(stripped, list) else [stripped]
+
+
+def run_pipeline(paths, output_dir):
+    # Runs every page through each stage separately, returns seconds per stage.
+    # create_mdblock includes its own inline parsing; text_to_textnodes is also timed alone
+    timings = dict.fromkeys(STAGES, 0.0)
+    with open(TEMPLATE_PATH, 'r') as template_file:
+        template = Template(template_file.read())
+    clock = time.perf_counter
+    for i, path in enumerate(paths):
+        start = clock()
+        with open(path, 'r') as page_file:
+            markdown = page_file.read()
+        timings["read"] += clock() - start
+
+        start = clock()
+        blocks = markdown_to_blocks(markdown)
+        timings["markdown_to_blocks"] += clock() - start
+
+        start = clock()
+        md_blocks = [create_mdblock(block) for block in blocks]
+        timings["create_mdblock"] += clock() - start
+
+        texts = [text for block in blocks for text in inline_texts(block)]
+        start = clock()
+        for text in texts:
+            text_to_textnodes(text)
+        timings["text_to_textnodes"] += clock() - start
+
+        start = clock()
+        node = ParentNode("div", [md_block.to_html_node() for md_block in md_blocks])
+        timings["to_html_node"] += clock() - start
+
+        start = clock()
+        content = node.to_html()
+        timings["to_html"] += clock() - start
+
+        start = clock()
+        html = template.render({"Title": extract_title(markdown), "Content": content})
+        timings["template_fill"] += clock() - start
+
+        start = clock()
+        with open(os.path.join(output_dir, f"{i}.html"), 'w') as output_file:
+            output_file.write(html)
+        timings["write"] += clock() - start
+    return timings
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r') as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\nCompared with {baseline_path} ({baseline.get('revision')}):")
+    if baseline.get("corpus") != results["corpus"]:
+        print("Warning: the corpus differs, so the timings are not directly comparable")
+    for stage, result in results["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before:
+            change = result["seconds"] / before["seconds"] - 1
+            print(f"{stage:>20} {before['seconds']:>9.4f}s -> {result['seconds']:>9.4f}s {change:>+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the build pipeline")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--blocks", type=int, default=30, help="Blocks per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", type=parse_mix, default=None, help="Block weights, e.g. 'paragraph=4,ulist=2,code=1'")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest one is kept")
+    parser.add_argument("--output", type=str, default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        paths = write_corpus(os.path.join(work_dir, "content"), args.pages, args.blocks, args.seed, args.mix)
+        corpus_bytes = sum(os.path.getsize(path) for path in paths)
+        output_dir = os.path.join(work_dir, "public")
+        os.makedirs(output_dir)
+        runs = [run_pipeline(paths, output_dir) for _ in range(args.repeat)]
+    finally:
+        shutil.rmtree(work_dir)
+
+    stages = {}
+    for stage in STAGES:
+        seconds = min(run[stage] for run in runs)
+        stages[stage] = {"seconds": seconds, "us_per_page": seconds / args.pages * 1e6}
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "corpus": {"pages": args.pages, "blocks": args.blocks, "seed": args.seed, "bytes": corpus_bytes, "mix": args.mix},
+        "stages": stages,
+    }
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=1)
+
+    print(f"{args.pages} pages, {corpus_bytes / 1e6:.1f} MB of markdown (best of {args.repeat})")
+    for stage, result in stages.items():
+        print(f"{stage:>20} {result['seconds']:>9.4f}s {result['us_per_page']:>10.1f} us/page")
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from scan import SiteScan
+
+
+def make_tree(root, files, per_dir):
+    # Empty files are enough: the scan never reads them
+    for i in range(files):
+        directory = os.path.join(root, f"section{i // per_dir}")
+        if i % per_dir == 0:
+            os.makedirs(directory)
+        open(os.path.join(directory, f"page{i}.md"), 'w').close()
+
+
+def listdir_walk(source_dir, target_dir, jobs):
+    # The walk the removed generate_pages_recursive and copy_dir did: listdir, then isdir and exists per entry
+    for entry in sorted(os.listdir(source_dir)):
+        source = os.path.join(source_dir, entry)
+        if os.path.isdir(source):
+            listdir_walk(source, os.path.join(target_dir, entry), jobs)
+        elif os.path.exists(source) and entry.endswith(".md"):
+            jobs.append((source, os.path.join(target_dir, entry.replace(".md", ".html"))))
+    return jobs
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Source tree scan benchmark")
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--per-dir", type=int, default=100, help="Files per directory")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per walk; the fastest one is kept")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        content = os.path.join(work_dir, "content")
+        static = os.path.join(work_dir, "static")
+        make_tree(content, args.files, args.per_dir)
+        os.makedirs(static)
+        old = best(lambda: listdir_walk(content, "public", []), args.repeat)
+        new = best(lambda: SiteScan(content, static, "public"), args.repeat)
+        scan = SiteScan(content, static, "public")
+        assert scan.page_jobs == listdir_walk(content, "public", [])
+    finally:
+        shutil.rmtree(work_dir)
+    print(f"{args.files} files in directories of {args.per_dir} (best of {args.repeat})")
+    print(f"listdir + isdir/exists walk {old * 1000:>9.1f} ms")
+    print(f"scandir SiteScan            {new * 1000:>9.1f} ms ({old / new:.2f}x), stat results kept for later stages")
+
+
+if __name__ == "__main__":
+    main()
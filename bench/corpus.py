@@ -0,0 +1,103 @@
+import argparse
+import os
+import random
+
+WORDS = (
+    "the hobbit ring road went ever on and down from door where it began now far ahead "
+    "has gone must follow if can pursuing with eager feet until joins some larger way "
+    "many paths errands meet whither then cannot say elves mountain river forest"
+).split()
+
+DEFAULT_MIX = {"heading": 1, "paragraph": 4, "ulist": 1, "olist": 1, "code": 1, "quote": 1}
+
+
+def parse_mix(text):
+    # "paragraph=4,code=1" -> {"paragraph": 4, "code": 1}
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown block kind: {name}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class CorpusGenerator:  # Reproducible synthetic markdown
+
+    def __init__(self, seed=0, mix=None, words_per_block=40):
+        self.random = random.Random(seed)
+        self.mix = mix if mix is not None else DEFAULT_MIX
+        self.words_per_block = words_per_block
+
+    def words(self, count):
+        return " ".join(self.random.choice(WORDS) for _ in range(count))
+
+    def inline_text(self, count):
+        # Plain words sprinkled with bold, italic, code, links and images
+        parts = []
+        for _ in range(max(1, count // 6)):
+            parts.append(self.words(5))
+            match self.random.randrange(8):
+                case 0:
+                    parts.append(f"**{self.words(2)}**")
+                case 1:
+                    parts.append(f"*{self.words(2)}*")
+                case 2:
+                    parts.append(f"`{self.random.choice(WORDS)}()`")
+                case 3:
+                    parts.append(f"[{self.words(2)}](https://example.com/{self.random.choice(WORDS)})")
+                case 4:
+                    parts.append(f"![{self.words(2)}](/images/{self.random.choice(WORDS)}.png)")
+        return " ".join(parts)
+
+    def block(self, kind):
+        size = self.words_per_block
+        match kind:
+            case "heading":
+                return "#" * self.random.randint(1, 6) + " " + self.inline_text(6)
+            case "paragraph":
+                lines = [self.inline_text(size // 3) for _ in range(3)]
+                return "\n".join(lines)
+            case "ulist":
+                return "\n".join(f"{self.random.choice('*-')} {self.inline_text(size // 5)}" for _ in range(5))
+            case "olist":
+                return "\n".join(f"{i}. {self.inline_text(size // 5)}" for i in range(1, 6))
+            case "code":
+                return "```\n" + "\n".join(self.words(6) for _ in range(4)) + "\n```"
+            case "quote":
+                return "\n".join(f"> {self.inline_text(size // 4)}" for _ in range(3))
+        raise ValueError(f"Unknown block kind: {kind}")
+
+    def page(self, blocks):
+        kinds = self.random.choices(list(self.mix), weights=list(self.mix.values()), k=blocks - 1)
+        return "\n\n".join(["# " + self.words(4)] + [self.block(kind) for kind in kinds]) + "\n"
+
+
+def write_corpus(target_dir, pages, blocks_per_page=30, seed=0, mix=None, pages_per_dir=100):
+    # Writes pages/pages_per_dir directories of markdown pages, returns the paths written
+    generator = CorpusGenerator(seed, mix)
+    paths = []
+    for i in range(pages):
+        page_dir = os.path.join(target_dir, f"section{i // pages_per_dir:04d}")
+        os.makedirs(page_dir, exist_ok=True)
+        path = os.path.join(page_dir, f"page{i:06d}.md")
+        with open(path, 'w') as page_file:
+            page_file.write(generator.page(blocks_per_page))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic markdown corpus generator")
+    parser.add_argument("target", type=str, help="Directory to write the pages into")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--blocks", type=int, default=30, help="Blocks per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", type=parse_mix, default=None, help="Block weights, e.g. 'paragraph=4,ulist=2,code=1'")
+    args = parser.parse_args()
+    paths = write_corpus(args.target, args.pages, args.blocks, args.seed, args.mix)
+    print(f"Wrote {len(paths)} pages to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import http.client
+import threading
+import time
+
+
+def client(host, port, paths, deadline, revalidate, results):
+    # One keep-alive connection per client; http.client reconnects if the server closes it
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    etags = {}
+    latencies = []
+    errors = 0
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        headers = {}
+        if revalidate and path in etags:
+            headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+        if response.status >= 400:
+            errors += 1
+        elif response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    connection.close()
+    results.append((latencies, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for server.py")
+    parser.add_argument("--host", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent connections")
+    parser.add_argument("--seconds", type=float, default=5, help="Test duration")
+    parser.add_argument("--revalidate", action="store_true", help="Send If-None-Match with known ETags")
+    parser.add_argument("paths", nargs="*", default=["/", "/index.css", "/majesty/", "/images/rivendell.png"])
+    args = parser.parse_args()
+
+    results = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=client, args=(args.host, args.port, args.paths, deadline, args.revalidate, results))
+        for _ in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    errors = sum(client_errors for _, client_errors in results)
+    if not latencies:
+        print(f"No successful requests ({errors} errors)")
+        return
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{len(latencies) / args.seconds:.0f} requests/s, p50 {p50:.2f} ms, p99 {p99:.2f} ms, {errors} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,214 @@
+import io
 import os
+import sys
+import json
+import time
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import threading
+from functools import partial
+from urllib.parse import (
+    parse_qs,
+    urlsplit
+)
+from http.server import HTTPServer, ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from compress import is_compressible
+from httpcache import (
+    CachePolicy,
+    FileCache,
+    choose_variant
+)
+from livereload import (
+    LIVERELOAD_PATH,
+    DirectoryWatcher,
+    ReloadBroadcaster,
+    inject_livereload
+)
+from search import (
+    SEARCH_DIR,
+    SearchIndexReader
+)
+from sitebuild import (
+    Site,
+    SiteConfig
+)
+
+SEARCH_PATH = "/_search"
+MAX_SEARCH_RESULTS = 50
+
+
+def send_search(handler):
+    # /_search?q=words[&limit=N] as JSON, answered from the memory-mapped index of the served site
+    query = parse_qs(urlsplit(handler.path).query)
+    text = query.get("q", [""])[0]
+    try:
+        limit = int(query.get("limit", ["10"])[0])
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        handler.send_error(400, "limit must be a positive number")
+        return
+    limit = min(limit, MAX_SEARCH_RESULTS)
+    start = time.perf_counter()
+    results, total = handler.search_index.search(text, limit)
+    body = json.dumps({
+        "query": text,
+        "total": total,
+        "results": results,
+        "ms": round((time.perf_counter() - start) * 1000, 3),
+    }).encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.send_header("Cache-Control", "no-store")
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+class CachingRequestHandler(SimpleHTTPRequestHandler):  # HTTP/1.1 keep-alive with validators and a hot file cache
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True          # Headers and body go out as separate writes on a kept-alive socket
+    file_cache = FileCache()
+    cache_policy = CachePolicy()
+    search_index = None
+
+    def do_GET(self):
+        if self.search_index is not None and self.path.split("?", 1)[0] == SEARCH_PATH:
+            send_search(self)
+            return
+        super().do_GET()
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, "index.html")
+            if not self.path.split("?", 1)[0].endswith("/") or not os.path.isfile(index):
+                return super().send_head()      # Redirect to the trailing slash or list the directory
+            path = index
+        # Pre-compressed siblings written by the build are sent as they are, no compression here
+        served_path, encoding = choose_variant(path, self.headers.get("Accept-Encoding"))
+        try:
+            entry = self.file_cache.get(served_path)
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            self.send_error(404, "File not found")
+            return None
+        if entry.is_not_modified(self.headers):
+            self.send_response(304)
+            self.send_validators(entry, path, encoding)
+            self.end_headers()
+            return None
+        body = io.BytesIO(entry.body) if entry.body is not None else open(served_path, 'rb')
+        self.send_response(200)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(entry.size))
+        self.send_validators(entry, path, encoding)
+        self.end_headers()
+        return body
+
+    def send_validators(self, entry, path, encoding=None):
+        self.send_header("ETag", entry.etag)
+        self.send_header("Last-Modified", entry.last_modified)
+        self.send_header("Cache-Control", self.cache_policy.header_for(path))
+        if is_compressible(path):
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):  # Serves pages with a reload listener and the event stream
+
+    broadcaster = None
+    search_index = None
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == LIVERELOAD_PATH:
+            self.stream_reloads()
+            return
+        if self.search_index is not None and path == SEARCH_PATH:
+            send_search(self)
+            return
+        file_path = self.translate_path(self.path)
+        if path.endswith("/"):
+            file_path = os.path.join(file_path, "index.html")
+        if file_path.endswith(".html") and os.path.isfile(file_path):
+            self.send_page(file_path)
+            return
+        super().do_GET()
+
+    def send_page(self, file_path):
+        with open(file_path, 'r') as page_file:
+            body = inject_livereload(page_file.read()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        generation = self.broadcaster.generation
+        try:
+            while True:
+                latest = self.broadcaster.wait(generation, timeout=15)
+                if latest == generation:
+                    self.wfile.write(b": keep-alive\n\n")     # Lets us notice closed tabs
+                else:
+                    generation = latest
+                    self.wfile.write(b"data: reload\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def watch(site, broadcaster, interval):
+    # Rebuilds through the site's dependency graph, which also keeps the incremental build
+    # records, the page index and the search index current
+    watcher = DirectoryWatcher(site.watched_paths())
+    while True:
+        time.sleep(interval)
+        changed, removed = watcher.poll()
+        if not changed and not removed:
+            continue
+        start = time.perf_counter()
+        try:
+            result = site.rebuild(changed + removed)
+        except Exception as error:
+            print(f"Rebuild failed: {error}")
+            continue
+        print(f"{result.pages} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for source, error in result.errors:
+            print(f"{source}: {error}")
+        watcher.paths = site.watched_paths()            # Templates may include other partials now
+        broadcaster.notify()
 
 
 def run(
-    server_class=HTTPServer,
-    handler_class=SimpleHTTPRequestHandler,
+    server_class=ThreadingHTTPServer,
+    handler_class=CachingRequestHandler,
     port=8888,
     directory=None,
+    site=None,
+    interval=0.1,
 ):
-    if directory:  # Change the current working directory if directory is specified
-        os.chdir(directory)
+    if site:  # Watch mode: rebuild on changes and reload open pages
+        broadcaster = ReloadBroadcaster()
+        handler_class = type("WatchHandler", (LiveReloadHandler,), {"broadcaster": broadcaster})
+        server_class = ThreadingHTTPServer
+        threading.Thread(target=watch, args=(site, broadcaster, interval), daemon=True).start()
+        print(f"Watching {site.config.content_dir}, {site.config.static_dir} and the page templates")
+    if issubclass(handler_class, (CachingRequestHandler, LiveReloadHandler)):
+        handler_class.search_index = SearchIndexReader(os.path.join(directory or ".", SEARCH_DIR))
     server_address = ("", port)
-    httpd = server_class(server_address, handler_class)
+    httpd = server_class(server_address, partial(handler_class, directory=directory))
     print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
     httpd.serve_forever()
 
@@ -20,9 +216,57 @@ def run(
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="HTTP Server")
     parser.add_argument(
-        "--dir", type=str, help="Directory to serve files from", default="."
+        "--dir", type=str, default=None,
+        help="Directory to serve files from (default: '.', or the build output 'public' with --watch)"
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Rebuild changed pages into --dir and reload open browsers"
+    )
+    parser.add_argument("--content", type=str, help="Markdown sources to watch", default="content")
+    parser.add_argument("--static", type=str, help="Static assets to watch", default="static")
+    parser.add_argument("--template", type=str, help="Page template to watch", default="template.html")
+    parser.add_argument(
+        "--site-url", type=str, default=None, metavar="URL",
+        help="Keep sitemap.xml and feed.xml current in watch mode (as main.py --site-url)"
+    )
+    parser.add_argument(
+        "--search", action="store_true",
+        help="Keep the search index current in watch mode (as main.py --search)"
+    )
+    parser.add_argument("--interval", type=float, help="Seconds between change checks", default=0.1)
+    parser.add_argument(
+        "--simple", action="store_true",
+        help="Use the plain single-threaded HTTP/1.0 server (for comparison)"
+    )
+    parser.add_argument(
+        "--cache-mb", type=float, help="Memory used to keep hot files", default=64
+    )
+    parser.add_argument(
+        "--cache-control", action="append", default=[], metavar=".EXT=VALUE",
+        help="Cache-Control header for an extension, e.g. '.css=public, max-age=600'"
+    )
     args = parser.parse_args()
+    if args.dir is None:
+        # Watch mode writes into the directory it serves, which must not be the source tree
+        args.dir = "public" if args.watch else "."
 
-    run(port=args.port, directory=args.dir)
\ No newline at end of file
+    site = None
+    if args.watch:
+        site = Site(SiteConfig(
+            content_dir=args.content,
+            static_dir=args.static,
+            template_path=args.template,
+            target_dir=args.dir,
+            incremental=True,
+            site_url=args.site_url,
+            search=args.search,
+        ))
+    if args.simple:
+        run(HTTPServer, SimpleHTTPRequestHandler, port=args.port, directory=args.dir, site=site, interval=args.interval)
+    else:
+        CachingRequestHandler.file_cache = FileCache(int(args.cache_mb * 1024 * 1024))
+        for rule in args.cache_control:
+            CachingRequestHandler.cache_policy.add_rule(rule)
+        run(port=args.port, directory=args.dir, site=site, interval=args.interval)
\ No newline at end of file
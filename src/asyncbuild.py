@@ -0,0 +1,105 @@
+import os
+import asyncio
+import logging
+import mdblock
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor
+)
+from functools import partial
+from mdblock import (
+    PageText,
+    enable_block_memo,
+    generate_page,
+    render_document
+)
+from output import write_if_changed
+from search import count_terms
+
+logger = logging.getLogger(__name__)
+
+
+def read_source(path):
+    # Returns the markdown of path, or None when it is large enough for generate_page to stream it
+    if os.path.getsize(path) >= mdblock.STREAM_MIN_BYTES:
+        return None
+    with open(path, 'r') as origin_file:
+        return origin_file.read()
+
+
+def render_source(source, markdown, template_path, dest, cache=None, memo_entries=None, collect_terms=False):
+    # The CPU part of a page, run by the render workers. Returns (page html, block memo stats,
+    # changed, terms); for a streamed source, which generate_page has already written, the
+    # html is None. terms is (title, {term: frequency}) with collect_terms, None otherwise
+    logger.info(f"Generating page from {source} to {dest} using {template_path}")
+    memo = enable_block_memo(memo_entries) if memo_entries else None
+    memo_before = (memo.hits, memo.misses) if memo is not None else (0, 0)
+    page_text = PageText() if collect_terms else None
+    changed = None
+    if markdown is None:
+        changed = generate_page(source, template_path, dest, cache, page_text)
+        html = None
+    else:
+        html = render_document(markdown, template_path, cache, page_text)
+    memo_stats = (memo.hits - memo_before[0], memo.misses - memo_before[1]) if memo is not None else None
+    terms = (page_text.title, count_terms(page_text.blocks)) if page_text is not None else None
+    return html, memo_stats, changed, terms
+
+
+async def render_pages_async(
+    jobs, workers=1, cache=None, memo_entries=None, collect_terms=False, prefetch=32, writers=8
+):
+    # Renders (source, destination, template) jobs with reads, renders and writes overlapping:
+    # up to prefetch sources are read ahead by I/O threads while workers render earlier ones,
+    # and finished pages wait in a bounded queue for the writer tasks.
+    # Returns (source, error, None, memo stats, changed, terms) for every job, like render_job
+    loop = asyncio.get_running_loop()
+    results = [(source, None, None, None, False, None) for source, _, _ in jobs]
+    read_slots = asyncio.Semaphore(prefetch)
+    pages = asyncio.Queue(maxsize=writers * 2)
+    with ThreadPoolExecutor(max_workers=prefetch + writers) as io_pool, (
+        ProcessPoolExecutor(max_workers=workers) if workers > 1 else ThreadPoolExecutor(max_workers=1)
+    ) as cpu_pool:
+
+        def failed(index, exception):
+            results[index] = (jobs[index][0], f"{type(exception).__name__}: {exception}", None, None, False, None)
+
+        async def process(index, job):
+            source, dest, template_path = job
+            try:
+                async with read_slots:
+                    markdown = await loop.run_in_executor(io_pool, read_source, source)
+                    html, memo_stats, changed, terms = await loop.run_in_executor(cpu_pool, partial(
+                        render_source, source, markdown, template_path, dest, cache, memo_entries, collect_terms
+                    ))
+                results[index] = (source, None, None, memo_stats, changed, terms)
+                if html is not None:
+                    await pages.put((index, dest, html))
+            except Exception as exception:
+                failed(index, exception)
+
+        async def write():
+            while True:
+                page = await pages.get()
+                if page is None:
+                    return
+                index, dest, html = page
+                try:
+                    changed = await loop.run_in_executor(io_pool, write_if_changed, dest, html)
+                    source, error, records, memo_stats, _, terms = results[index]
+                    results[index] = (source, error, records, memo_stats, changed, terms)
+                except Exception as exception:
+                    failed(index, exception)
+
+        # Each output directory is created once, before any page is written
+        directories = sorted({os.path.dirname(dest) for _, dest, _ in jobs})
+        await asyncio.gather(*(
+            loop.run_in_executor(io_pool, partial(os.makedirs, directory, exist_ok=True))
+            for directory in directories
+        ))
+        writer_tasks = [asyncio.create_task(write()) for _ in range(writers)]
+        await asyncio.gather(*(process(index, job) for index, job in enumerate(jobs)))
+        for _ in writer_tasks:
+            await pages.put(None)
+        await asyncio.gather(*writer_tasks)
+    return results
@@ -0,0 +1,306 @@
+import os
+import asyncio
+import logging
+import instrument
+from asyncbuild import render_pages_async
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from instrument import BuildProfile
+from manifest import (
+    BuildManifest,
+    GENERATOR_VERSION,
+    HashCache
+)
+from mdblock import (
+    PageText,
+    active_block_memo,
+    enable_block_memo,
+    generate_page
+)
+from scan import (
+    find_pages,
+    scan_tree
+)
+from search import count_terms
+from template import load_template
+
+# A file with this name in a content directory is the template of the pages below it
+TEMPLATE_NAME = "template.html"
+
+logger = logging.getLogger(__name__)
+
+
+def page_destination(source, source_dir, target_dir):
+    # content/blog/post.md -> public/blog/post.html
+    relative_dir, entry = os.path.split(os.path.relpath(source, source_dir))
+    return os.path.join(target_dir, relative_dir, entry.replace(".md", ".html"))
+
+
+def collect_page_jobs(source_dir, target_dir):
+    # Walks the content tree and returns a sorted list of (source .md, destination .html) pairs
+    if not os.path.exists(source_dir):
+        raise Exception('Directory does not exist')
+    return find_pages(source_dir, target_dir, scan_tree(source_dir))
+
+
+def resolve_templates(jobs, source_dir, default_template):
+    # Maps each page source to the template.html closest to it inside source_dir,
+    # or to default_template when there is none
+    root = os.path.normpath(source_dir)
+    by_dir = {}
+
+    def template_for(directory):
+        if directory not in by_dir:
+            candidate = os.path.join(directory, TEMPLATE_NAME)
+            if os.path.exists(candidate):
+                by_dir[directory] = candidate
+            elif os.path.normpath(directory) == root or not directory:
+                by_dir[directory] = default_template
+            else:
+                by_dir[directory] = template_for(os.path.dirname(directory))
+        return by_dir[directory]
+
+    return {source: template_for(os.path.dirname(source)) for source, _ in jobs}
+
+
+def page_inputs(source_dir, template_path, target_dir, jobs=None):
+    # The dependency graph of the current tree: (source, destination, template, inputs)
+    # for every page, where the inputs are the source, its template and every partial
+    # the template includes. jobs, when given, are the pages of an earlier scan
+    if jobs is None:
+        jobs = collect_page_jobs(source_dir, target_dir)
+    templates = resolve_templates(jobs, source_dir, template_path)
+    return [
+        (source, dest, templates[source], [source, *load_template(templates[source]).dependencies])
+        for source, dest in jobs
+    ]
+
+
+def page_graph(source_dir, template_path, target_dir, jobs=None, hashes=None):
+    # page_inputs with the inputs as {input path: hash}; each file is hashed at most once,
+    # and not at all if hashes (a HashCache) knows it unchanged since the last build
+    hashes = hashes if hashes is not None else HashCache()
+    return [
+        (source, dest, template, {path: hashes.hash(path) for path in inputs})
+        for source, dest, template, inputs in page_inputs(source_dir, template_path, target_dir, jobs)
+    ]
+
+
+class PageBuildError(Exception):   # Raised once every page has been tried, listing each failure
+
+    def __init__(self, failures):
+        self.failures = failures            # List of (source path, error message)
+        lines = [f"{source}: {error}" for source, error in failures]
+        super().__init__(f"{len(failures)} page(s) failed to build:\n" + "\n".join(lines))
+
+
+class RenderReport:  # What render_pages did, page by page
+
+    def __init__(self, collect_terms=False):
+        self.rendered = []          # (source, destination) of every page rendered without error
+        self.changed = []           # Destinations whose content changed, i.e. were actually written
+        self.failures = []          # (source, error message)
+        self.removed = []           # Outputs of deleted sources, removed by incremental builds
+        # With collect_terms, source -> (title, {term: frequency}) of every rendered page,
+        # taken from the text it rendered, for the search index
+        self.terms = {} if collect_terms else None
+
+    def __repr__(self):
+        return f"Rendered {len(self.rendered)} page(s), {len(self.changed)} changed, {len(self.failures)} failed"
+
+
+def render_job(job, cache=None, profiling=False, trace=False, memo_entries=None, collect_terms=False):
+    # In a pool worker, profiling collects the page stages in a fresh profile
+    # that is sent back with the result and merged by the parent. The block memo
+    # lives on in the worker process, so pages rendered by the same worker share it.
+    # With collect_terms, the (title, terms) of the page come back with the result
+    profile = None
+    if profiling:
+        profile = BuildProfile(trace)
+        instrument.activate(profile)
+    memo = enable_block_memo(memo_entries) if memo_entries else None
+    memo_before = (memo.hits, memo.misses) if memo is not None else (0, 0)
+    source, dest, template_path = job
+    error = None
+    changed = False
+    page_text = PageText() if collect_terms else None
+    terms = None
+    try:
+        changed = generate_page(source, template_path, dest, cache, page_text)
+        if page_text is not None:
+            terms = (page_text.title, count_terms(page_text.blocks))
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+    finally:
+        if profile is not None:
+            instrument.deactivate()
+    records = profile.to_records() if profile is not None else None
+    memo_stats = (memo.hits - memo_before[0], memo.misses - memo_before[1]) if memo is not None else None
+    return source, error, records, memo_stats, changed, terms
+
+
+def make_output_dirs(jobs):
+    # Creates each output directory once, rather than checking it for every page
+    for target_dir in sorted({os.path.dirname(dest) for _, dest, _ in jobs}):
+        os.makedirs(target_dir, exist_ok=True)
+
+
+def render_pages(jobs, template_path, workers=1, cache=None, templates=None, async_io=False, report=None):
+    # Renders every (source, destination) job, in a process pool when workers > 1, with
+    # template_path or the template templates maps its source to. With async_io, reads and
+    # writes run in I/O threads that overlap with rendering. A RenderReport, when given,
+    # collects the outcome of every page, and their terms when it was made to.
+    # Output does not depend on the worker count; failures are collected per file
+    templates = templates or {}
+    jobs = [(source, dest, templates.get(source, template_path)) for source, dest in jobs]
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+    profile = instrument.active_profile()
+    memo = active_block_memo()
+    collect_terms = report is not None and report.terms is not None
+    if async_io:
+        # Page stages are not timed in this mode; a block memo in this process is used directly
+        memo_entries = memo.max_entries if memo is not None and workers > 1 else None
+        with instrument.stage("render_async"):
+            results = asyncio.run(render_pages_async(jobs, workers, cache, memo_entries, collect_terms))
+    elif workers == 1 or len(jobs) <= 1:
+        make_output_dirs(jobs)
+        # Profile and block memo of this process are used directly
+        results = [render_job(job, cache, collect_terms=collect_terms) for job in jobs]
+    else:
+        make_output_dirs(jobs)
+        worker_job = partial(
+            render_job,
+            cache=cache,
+            profiling=profile is not None,
+            trace=profile is not None and profile.events is not None,
+            memo_entries=memo.max_entries if memo is not None else None,
+            collect_terms=collect_terms,
+        )
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(worker_job, jobs, chunksize=chunksize))
+    for _, _, records, memo_stats, _, _ in results:
+        if records is not None:
+            profile.merge(records)
+        if memo_stats is not None:
+            memo.hits += memo_stats[0]
+            memo.misses += memo_stats[1]
+    if report is not None:
+        for (source, dest, _), (_, error, _, _, page_changed, terms) in zip(jobs, results):
+            if error is not None:
+                report.failures.append((source, error))
+                continue
+            report.rendered.append((source, dest))
+            if page_changed:
+                report.changed.append(dest)
+            if terms is not None:
+                report.terms[source] = terms
+    changed = sum(1 for _, _, _, _, page_changed, _ in results if page_changed)
+    if jobs:
+        logger.info(f"Changed {changed} of {len(jobs)} rendered page(s); the rest were identical and kept")
+    failures = [(source, error) for source, error, _, _, _, _ in results if error is not None]
+    if failures:
+        raise PageBuildError(failures)
+    return len(jobs)
+
+
+def generate_pages_parallel(
+    source_dir, template_path, target_dir, workers=None, cache=None, async_io=False, jobs=None, report=None
+):
+    if not os.path.exists(template_path):
+        raise Exception("Template path does not exist")
+    if jobs is None:
+        jobs = collect_page_jobs(source_dir, target_dir)
+    templates = resolve_templates(jobs, source_dir, template_path)
+    return render_pages(jobs, template_path, workers, cache, templates, async_io, report)
+
+
+def remove_output(dest_path, target_dir):
+    # Deletes a stale output file and prunes the directories it leaves empty
+    if os.path.exists(dest_path):
+        logger.info(f"Removing stale output: {dest_path}")
+        os.remove(dest_path)
+    parent = os.path.dirname(dest_path)
+    root = os.path.abspath(target_dir)
+    while os.path.abspath(parent).startswith(root + os.sep) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+
+
+def generate_pages_incremental(
+    source_dir, template_path, target_dir, manifest_path, workers=1, cache=None, async_io=False, scan=None,
+    report=None, output_dir=None
+):
+    # Renders only the pages with an input (source, template or partial) that changed,
+    # or all of them when the generator version or the output directory changed. With a
+    # SiteScan, its pages and stat results are used instead of walking source_dir again.
+    # output_dir is where the pages are published, when target_dir is a stage of it
+    # Returns the number of pages that were rendered
+    if not os.path.exists(template_path):
+        raise Exception("Template path does not exist")
+    output_dir = os.path.abspath(output_dir if output_dir is not None else target_dir)
+    manifest = BuildManifest.load(manifest_path)
+    full_rebuild = not manifest.is_compatible(output_dir)
+    hashes = HashCache(manifest.files, scan.stats if scan is not None else None)
+    jobs = scan.page_jobs if scan is not None else None
+
+    new_pages = {}
+    templates = {}
+    dirty_jobs = []
+    for source, dest, template, inputs in page_graph(source_dir, template_path, target_dir, jobs, hashes):
+        if full_rebuild or not manifest.is_fresh(source, dest, inputs, target_dir):
+            dirty_jobs.append((source, dest))
+        templates[source] = template
+        new_pages[source] = {"dest": os.path.relpath(dest, target_dir), "inputs": inputs}
+    try:
+        rendered = render_pages(dirty_jobs, template_path, workers, cache, templates, async_io, report)
+    except PageBuildError as error:
+        # Failed pages are left out of the manifest so the next build retries them
+        for source, _ in error.failures:
+            del new_pages[source]
+        BuildManifest(GENERATOR_VERSION, new_pages, hashes.used, output_dir).save(manifest_path)
+        raise
+
+    live_dests = {page["dest"] for page in new_pages.values()}
+    for source, entry in manifest.pages.items():
+        if source not in new_pages and entry["dest"] not in live_dests:
+            remove_output(os.path.join(target_dir, entry["dest"]), target_dir)
+            if report is not None:
+                report.removed.append(os.path.join(target_dir, entry["dest"]))
+
+    BuildManifest(GENERATOR_VERSION, new_pages, hashes.used, output_dir).save(manifest_path)
+    logger.info(f"Rendered {rendered} of {len(new_pages)} pages")
+    return rendered
+
+
+def explain(target, source_dir, template_path, target_dir, manifest_path):
+    # Describes target from the dependency graph: for a page (its source or its output),
+    # its inputs and whether an incremental build renders it again; for any other file,
+    # the pages that depend on it. Returns the lines of the description
+    manifest = BuildManifest.load(manifest_path)
+    graph = page_graph(source_dir, template_path, target_dir, hashes=HashCache(manifest.files))
+    target = os.path.normpath(target)
+    for source, dest, template, inputs in graph:
+        if target not in (os.path.normpath(source), os.path.normpath(dest)):
+            continue
+        changed = manifest.changed_inputs(source, inputs)
+        lines = [f"{dest} is built from:"]
+        for path in inputs:
+            lines.append(f"  {path} ({'changed' if path in changed else 'unchanged'})")
+        for path in changed:
+            if path not in inputs:
+                lines.append(f"  {path} (no longer used)")
+        if not manifest.is_compatible(target_dir):
+            lines.append(f"It will be rendered again: no previous build into {target_dir} with this generator version")
+        elif manifest.is_fresh(source, dest, inputs, target_dir):
+            lines.append("It is up to date")
+        elif changed:
+            lines.append(f"It will be rendered again: {len(changed)} input(s) changed")
+        else:
+            lines.append("It will be rendered again: its output is missing")
+        return lines
+    dependents = [dest for _, dest, _, inputs in graph if target in {os.path.normpath(path) for path in inputs}]
+    if not dependents:
+        return [f"No page depends on {target}"]
+    return [f"{len(dependents)} page(s) depend on {target}:"] + [f"  {dest}" for dest in dependents]
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import socket
+import argparse
+
+# Kept free of generator imports so that a request costs little more than interpreter startup
+SOCKET_PATH = os.path.join(".build", "daemon.sock")
+
+
+def send_request(message, socket_path=SOCKET_PATH):
+    # One JSON line out, one JSON line back
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with connection.makefile('rb') as response:
+            line = response.readline()
+    if not line:
+        raise ConnectionError("The build daemon closed the connection without answering")
+    return json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a request to a running build daemon (main.py --daemon)")
+    parser.add_argument(
+        "command", choices=("build", "rebuild", "ping", "stop"),
+        help="build: incremental build of the whole site; rebuild: only what depends on PATHS"
+    )
+    parser.add_argument("paths", nargs="*", metavar="PATHS", help="Changed, added or deleted files")
+    parser.add_argument("--socket", type=str, default=SOCKET_PATH, help="Socket the daemon listens on")
+    args = parser.parse_args()
+
+    message = {"command": args.command}
+    if args.command == "rebuild":
+        # The daemon may run from another directory
+        message["paths"] = [os.path.abspath(path) for path in args.paths]
+    try:
+        response = send_request(message, args.socket)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"No build daemon is listening on {args.socket}", file=sys.stderr)
+        sys.exit(2)
+    if "error" in response:
+        print(response["error"], file=sys.stderr)
+        sys.exit(1)
+    if "summary" in response:
+        print(response["summary"])
+    for source, error in response.get("errors", []):
+        print(f"{source}: {error}", file=sys.stderr)
+    if not response.get("ok", True):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
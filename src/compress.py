@@ -0,0 +1,126 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli                       # Optional: .br files are only written when it is installed
+except ImportError:
+    brotli = None
+
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt", ".map"}
+MIN_COMPRESS_BYTES = 256                # Smaller files do not get any smaller
+
+
+def gzip_bytes(data):
+    # mtime=0 keeps the output identical from one build to the next
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def brotli_bytes(data):
+    return brotli.compress(data, quality=11)
+
+
+def available_encodings():
+    # (Content-Encoding, file suffix, compressor), most preferred first
+    encodings = [("gzip", ".gz", gzip_bytes)]
+    if brotli is not None:
+        encodings.insert(0, ("br", ".br", brotli_bytes))
+    return encodings
+
+
+def is_compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def gets_variants(path):
+    # Whether precompress_dir keeps compressed siblings of path
+    try:
+        return is_compressible(path) and os.path.getsize(path) >= MIN_COMPRESS_BYTES
+    except FileNotFoundError:
+        return False
+
+
+def is_fresh_variant(source_path, variant_path):
+    # Variants get the mtime of their source, so any later edit makes them stale
+    try:
+        return os.stat(variant_path).st_mtime_ns == os.stat(source_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(path, encodings):
+    # Writes the missing or stale variants of one file, returns how many were written
+    with open(path, 'rb') as source_file:
+        data = None
+        written = 0
+        source_stat = os.fstat(source_file.fileno())
+        for _, suffix, compressor in encodings:
+            variant_path = path + suffix
+            if is_fresh_variant(path, variant_path):
+                continue
+            if data is None:
+                data = source_file.read()
+            tmp_path = variant_path + ".tmp"
+            with open(tmp_path, 'wb') as variant_file:
+                variant_file.write(compressor(data))
+            os.utime(tmp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+            os.replace(tmp_path, variant_path)
+            written += 1
+    return written
+
+
+def precompress_dir(target_dir, workers=None, keep=()):
+    # Writes .gz (and .br) siblings for text assets that changed, and removes the siblings
+    # of files that are gone or have shrunk below MIN_COMPRESS_BYTES. keep holds the paths,
+    # relative to target_dir, of files that are not ours to write or remove, such as the
+    # compressed files a site ships as static files
+    # Returns (variants written, variants already up to date)
+    encodings = available_encodings()
+    suffixes = tuple(suffix for _, suffix, _ in encodings)
+    keep = set(keep)
+    sources = []
+    for dirpath, _, filenames in os.walk(target_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            relative_path = os.path.relpath(path, target_dir)
+            if relative_path in keep:
+                continue
+            if filename.endswith(suffixes):
+                source = os.path.splitext(path)[0]
+                if is_compressible(source) and not gets_variants(source):
+                    os.remove(path)
+            elif gets_variants(path):
+                own = [encoding for encoding in encodings if relative_path + encoding[1] not in keep]
+                sources.append((path, own))
+    sources.sort()
+    return compress_files(sources, workers)
+
+
+def update_variants(paths, target_dir, workers=None, keep=()):
+    # precompress_dir for just the given output files, changed or removed: writes their
+    # stale variants, and removes those of files that are gone or too small. Returns
+    # (variants written, variants already up to date)
+    encodings = available_encodings()
+    keep = set(keep)
+    sources = []
+    for path in sorted(set(paths)):
+        relative_path = os.path.relpath(path, target_dir)
+        if not is_compressible(path) or relative_path in keep:
+            continue
+        own = [encoding for encoding in encodings if relative_path + encoding[1] not in keep]
+        if gets_variants(path):
+            sources.append((path, own))
+            continue
+        for _, suffix, _ in own:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return compress_files(sources, workers)
+
+
+def compress_files(sources, workers=None):
+    # Runs compress_file over the (path, encodings) sources
+    # zlib and brotli release the GIL, so threads compress in parallel
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        written = sum(executor.map(lambda source: compress_file(*source), sources))
+    return written, sum(len(encodings) for _, encodings in sources) - written
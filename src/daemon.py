@@ -0,0 +1,93 @@
+import os
+import json
+import socket
+import logging
+import threading
+import socketserver
+from client import SOCKET_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def result_to_dict(result):
+    # The JSON answer to a build or rebuild request
+    return {
+        "ok": result.ok,
+        "summary": repr(result),
+        "rendered": [dest for _, dest in result.pages.rendered],
+        "changed": result.pages.changed,
+        "removed": result.pages.removed,
+        "errors": result.errors,
+        "static": result.static.copied if result.static is not None else [],
+        "timings": result.timings,
+        "seconds": result.seconds,
+    }
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):  # Answers each JSON line of a connection
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.daemon.handle(json.loads(line))
+            except Exception as error:
+                logger.exception("Request failed")
+                response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class BuildDaemon:  # Keeps a Site resident and builds it on request from a Unix socket
+
+    def __init__(self, site, socket_path=SOCKET_PATH):
+        self.site = site
+        self.socket_path = socket_path
+        self.server = None
+
+    def handle(self, request):
+        # Requests are handled one at a time, so builds never overlap
+        command = request.get("command")
+        if command == "ping":
+            return {"ok": True, "summary": "pong"}
+        if command == "build":
+            result = self.site.build()
+        elif command == "rebuild":
+            result = self.site.rebuild(request.get("paths", []))
+        elif command == "stop":
+            # shutdown() waits for serve_forever to return, which cannot happen from this request
+            threading.Thread(target=self.server.shutdown).start()
+            return {"ok": True, "summary": "Stopping"}
+        else:
+            return {"ok": False, "error": f"Unknown command: {command}"}
+        logger.info(result)
+        return result_to_dict(result)
+
+    def remove_stale_socket(self):
+        # A socket file nobody listens on is left over from a daemon that did not exit cleanly
+        if not os.path.exists(self.socket_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except ConnectionRefusedError:
+                os.remove(self.socket_path)
+                return
+        raise Exception(f"A build daemon is already listening on {self.socket_path}")
+
+    def listen(self):
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        self.remove_stale_socket()
+        self.server = socketserver.UnixStreamServer(self.socket_path, DaemonRequestHandler)
+        self.server.daemon = self
+
+    def serve_forever(self):
+        # Builds once so that templates, caches and the dependency graph are warm for the first request
+        if self.server is None:
+            self.listen()
+        logger.info(self.site.build())
+        logger.info(f"Build daemon listening on {self.socket_path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            os.remove(self.socket_path)
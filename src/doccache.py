@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import shutil
+
+# Bump whenever parsing or HTML serialization changes, so cached content is not reused
+PARSER_VERSION = "1"
+
+
+class DocumentCache:  # Content HTML, title and block texts of each markdown source, kept on disk between builds
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, markdown):
+        digest = hashlib.sha256(PARSER_VERSION.encode("utf-8") + b"\0" + markdown.encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        # Returns (title, content html, block texts or None) or None
+        path = self.path(key)
+        try:
+            with open(path, 'r') as entry_file:
+                entry = json.load(entry_file)
+            os.utime(path)              # The mtime orders entries for eviction
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["title"], entry["html"], entry.get("texts")
+
+    def put(self, key, title, html, texts=None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as entry_file:
+            json.dump({"title": title, "html": html, "texts": texts}, entry_file)
+        os.replace(tmp_path, path)
+
+    def entries(self):
+        entries = []
+        if not os.path.exists(self.cache_dir):
+            return entries
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith(".json"):
+                    stat = os.stat(os.path.join(dirpath, filename))
+                    entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(dirpath, filename)))
+        return entries
+
+    def evict(self):
+        # Deletes the least recently used entries until the cache fits in max_bytes
+        # Returns the number of entries removed
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
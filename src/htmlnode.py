@@ -1,22 +1,33 @@
+import io
+import sys
+from types import MappingProxyType
+
+# Shared read-only props for every node created without attributes
+EMPTY_PROPS = MappingProxyType({})
+
+
 class HTMLNode:
 
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag_str=None, value_str=None, children=None, props=None):
+        if tag_str is not None:
+            tag_str = sys.intern(tag_str)               # Equal tags share a single string
         self.tag = tag_str                              # A string representing the HTML tag name (e.g. "p", "a", "h1", etc.)
         self.value = value_str                          # A string representing the value of the HTML tag (e.g. the text inside a paragraph)
         self.children = children                        # A list of HTMLNode objects representing the children of this node
-        self.props = props if props is not None else {} # A dictionary of key-value pairs representing the attributes of the HTML tag. For example, a link (<a> tag) might have {"href": "https://www.google.com"}
+        self.props = props if props is not None else EMPTY_PROPS # A dictionary of key-value pairs representing the attributes of the HTML tag. For example, a link (<a> tag) might have {"href": "https://www.google.com"}
 
     def to_html(self):
         raise NotImplementedError
+
+    def write_html(self, stream):               # Writes the HTML fragments to any object with a write(str) method
+        raise NotImplementedError
     
     def props_to_html(self):
         if self.props == None:
             return ""
-        props_str = ""
-        for kw, value in self.props.items():
-            props_str += " "
-            props_str += f'''{kw}="{value}"'''
-        return props_str
+        return "".join(f''' {kw}="{value}"''' for kw, value in self.props.items())
 
     def __eq__(self, node):
         cond1 = self.tag == node.tag
@@ -36,6 +47,8 @@ class HTMLNode:
     
 class LeafNode(HTMLNode):                   # An HTMLNode with no children
 
+    __slots__ = ()
+
     def __init__(self, tag_str=None, value_str=None, props=None):
         super().__init__(tag_str, value_str, None, props)
 
@@ -45,19 +58,28 @@ class LeafNode(HTMLNode):                   # An HTMLNode with no children
         if not self.tag:
             return self.value
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+
+    def write_html(self, stream):
+        stream.write(self.to_html())
     
 class ParentNode(HTMLNode):                  # An HTMLNode with children
 
+    __slots__ = ()
+
     def __init__(self, tag_str, children, props=None):
         super().__init__(tag_str, None, children, props)
 
     def to_html(self):
+        buffer = io.StringIO()
+        self.write_html(buffer)
+        return buffer.getvalue()
+
+    def write_html(self, stream):
         if self.tag == None:
             raise ValueError("All ParentNodes require a tag")
         if self.children == None or self.children == {}:
             raise ValueError("All ParentNodes require children")
-        html = f"<{self.tag}>"
+        stream.write(f"<{self.tag}>")
         for node in self.children:
-            html += node.to_html()
-        html += f"</{self.tag}>"
-        return html
\ No newline at end of file
+            node.write_html(stream)
+        stream.write(f"</{self.tag}>")
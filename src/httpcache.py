@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from email.utils import (
+    formatdate,
+    parsedate_to_datetime
+)
+from compress import (
+    ENCODING_SUFFIXES,
+    is_compressible,
+    is_fresh_variant
+)
+
+DEFAULT_CACHE_CONTROL = {
+    ".html": "no-cache",
+    ".css": "public, max-age=3600",
+    ".js": "public, max-age=3600",
+    ".png": "public, max-age=86400",
+    ".jpg": "public, max-age=86400",
+    ".jpeg": "public, max-age=86400",
+    ".gif": "public, max-age=86400",
+    ".svg": "public, max-age=86400",
+    ".webp": "public, max-age=86400",
+    ".ico": "public, max-age=86400",
+    ".woff2": "public, max-age=604800",
+}
+
+
+def parse_accept_encoding(header):
+    # "gzip, br;q=0.5, *;q=0" -> {"gzip": 1.0, "br": 0.5, "*": 0.0}
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if coding == "":
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_variant(path, accept_encoding):
+    # Returns (file to send, Content-Encoding or None), preferring an up to date .br, then .gz
+    if not accept_encoding or not is_compressible(path):
+        return path, None
+    accepted = parse_accept_encoding(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            variant = path + ENCODING_SUFFIXES[encoding]
+            if is_fresh_variant(path, variant):
+                return variant, encoding
+    return path, None
+
+
+class CachePolicy:  # Picks the Cache-Control header from the file extension
+
+    def __init__(self, rules=None, default="no-cache"):
+        self.rules = dict(DEFAULT_CACHE_CONTROL if rules is None else rules)
+        self.default = default
+
+    def add_rule(self, rule):
+        # Parses ".css=public, max-age=600" as given on the command line
+        extension, _, value = rule.partition("=")
+        if not extension.startswith(".") or value == "":
+            raise ValueError(f"Invalid cache rule: {rule}")
+        self.rules[extension.lower()] = value
+
+    def header_for(self, path):
+        return self.rules.get(os.path.splitext(path)[1].lower(), self.default)
+
+
+class CachedFile:  # Body (when small enough to keep) and validators of a served file
+
+    __slots__ = ("path", "body", "etag", "mtime", "size", "state")
+
+    def __init__(self, path, body, etag, mtime, size, state):
+        self.path = path
+        self.body = body
+        self.etag = etag
+        self.mtime = mtime
+        self.size = size
+        self.state = state                  # (st_mtime_ns, st_size) the entry was read with
+
+    @property
+    def last_modified(self):
+        return formatdate(self.mtime, usegmt=True)
+
+    def is_not_modified(self, headers):
+        # If-None-Match wins over If-Modified-Since, as RFC 9110 asks
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+        if_modified_since = headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(self.mtime) <= since
+        return False
+
+
+class FileCache:  # Thread-safe LRU of hot files, bounded by the total size of their bodies
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_file_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes if max_file_bytes is not None else max_bytes // 8
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        # Returns a CachedFile, read again from disk if the file changed since it was cached
+        stat = os.stat(path)
+        state = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry.state == state:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        if stat.st_size > self.max_file_bytes:
+            # Too big to keep: it is streamed from disk, validated by size and mtime
+            etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+            return CachedFile(path, None, etag, stat.st_mtime, stat.st_size, state)
+        with open(path, 'rb') as file:
+            body = file.read()
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        entry = CachedFile(path, body, etag, stat.st_mtime, len(body), state)
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.bytes -= old.size
+            self.entries[path] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.size
+        return entry
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+from contextlib import (
+    contextmanager,
+    nullcontext
+)
+
+_active_profile = None
+_no_stage = nullcontext()
+
+
+class StageStats:  # Totals for one pipeline stage
+
+    __slots__ = ("seconds", "count", "bytes")
+
+    def __init__(self, seconds=0.0, count=0, nbytes=0):
+        self.seconds = seconds
+        self.count = count
+        self.bytes = nbytes
+
+
+class BuildProfile:  # Wall time, bytes and counts per stage and per page
+
+    def __init__(self, trace=False):
+        self.stages = {}                # stage name -> StageStats
+        self.pages = {}                 # page -> seconds spent in its stages
+        self.events = [] if trace else None
+        self.current_page = None
+
+    @contextmanager
+    def page(self, page):
+        previous = self.current_page
+        self.current_page = page
+        try:
+            yield
+        finally:
+            self.current_page = previous
+
+    @contextmanager
+    def stage(self, name, nbytes=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, nbytes)
+
+    def record(self, name, start, seconds, nbytes=0):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        stats.seconds += seconds
+        stats.count += 1
+        stats.bytes += nbytes
+        if self.current_page is not None:
+            self.pages[self.current_page] = self.pages.get(self.current_page, 0.0) + seconds
+        if self.events is not None:
+            self.events.append({
+                "name": name, "ph": "X", "ts": start * 1e6, "dur": seconds * 1e6,
+                "pid": os.getpid(), "tid": threading.get_ident(),
+                "args": {"page": self.current_page, "bytes": nbytes},
+            })
+
+    def add_bytes(self, name, nbytes):
+        self.stages.setdefault(name, StageStats()).bytes += nbytes
+
+    def to_records(self):
+        # Plain data, so worker processes can send their profile back to the parent
+        stages = {name: (stats.seconds, stats.count, stats.bytes) for name, stats in self.stages.items()}
+        return stages, self.pages, self.events
+
+    def merge(self, records):
+        stages, pages, events = records
+        for name, (seconds, count, nbytes) in stages.items():
+            stats = self.stages.setdefault(name, StageStats())
+            stats.seconds += seconds
+            stats.count += count
+            stats.bytes += nbytes
+        for page, seconds in pages.items():
+            self.pages[page] = self.pages.get(page, 0.0) + seconds
+        if self.events is not None and events:
+            self.events.extend(events)
+
+    def report(self, top=10):
+        lines = [f"{'stage':<16} {'seconds':>9} {'calls':>8} {'MB':>9}"]
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"{name:<16} {stats.seconds:>9.4f} {stats.count:>8} {stats.bytes / 1e6:>9.2f}")
+        if top and self.pages:
+            lines.append(f"\nSlowest {min(top, len(self.pages))} of {len(self.pages)} pages:")
+            for page, seconds in sorted(self.pages.items(), key=lambda item: -item[1])[:top]:
+                lines.append(f"{seconds * 1000:>9.2f} ms  {page}")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path):
+        # Loads in chrome://tracing or https://ui.perfetto.dev
+        with open(path, 'w') as trace_file:
+            json.dump({"traceEvents": self.events or [], "displayTimeUnit": "ms"}, trace_file)
+
+
+def activate(profile):
+    # Every stage() in this process reports to profile until deactivate()
+    global _active_profile
+    _active_profile = profile
+
+
+def deactivate():
+    global _active_profile
+    _active_profile = None
+
+
+def active_profile():
+    return _active_profile
+
+
+def stage(name, nbytes=0):
+    # Hook around a pipeline stage; costs one global lookup when nothing is profiling
+    if _active_profile is None:
+        return _no_stage
+    return _active_profile.stage(name, nbytes)
+
+
+def page(page_name):
+    if _active_profile is None:
+        return _no_stage
+    return _active_profile.page(page_name)
+
+
+class TimedWriter:  # Wraps an output stream to time and count what reaches it
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.seconds = 0.0
+        self.chars = 0
+
+    def write(self, text):
+        start = time.perf_counter()
+        self.stream.write(text)
+        self.seconds += time.perf_counter() - start
+        self.chars += len(text)
@@ -0,0 +1,71 @@
+import os
+import threading
+
+LIVERELOAD_PATH = "/__livereload"
+LIVERELOAD_SCRIPT = (
+    "<script>new EventSource(\"" + LIVERELOAD_PATH + "\")"
+    ".onmessage = function () { location.reload(); };</script>"
+)
+
+
+def inject_livereload(html):
+    # Adds the reload listener right before </body>, or at the end if there is none
+    index = html.rfind("</body>")
+    if index == -1:
+        return html + LIVERELOAD_SCRIPT
+    return html[:index] + LIVERELOAD_SCRIPT + html[index:]
+
+
+class DirectoryWatcher:  # Polls files and directories for changes in mtime or size
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for path in self.paths:
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+            else:
+                self.scan_dir(path, snapshot)
+        return snapshot
+
+    def scan_dir(self, directory, snapshot):
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.is_dir():
+                self.scan_dir(entry.path, snapshot)
+            elif entry.is_file():
+                stat = entry.stat()
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+    def poll(self):
+        # Returns the sorted lists of (changed or added, removed) paths since the last poll
+        snapshot = self.scan()
+        changed = [path for path, state in snapshot.items() if self.snapshot.get(path) != state]
+        removed = [path for path in self.snapshot if path not in snapshot]
+        self.snapshot = snapshot
+        return sorted(changed), sorted(removed)
+
+
+class ReloadBroadcaster:  # Wakes every open live reload connection after a rebuild
+
+    def __init__(self):
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation, timeout):
+        # Blocks until a build newer than generation happened or timeout passes
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
@@ -1,33 +1,172 @@
-import os
-import shutil
-from textnode import TextNode
-from mdblock import generate_pages_recursive
-
-def copy_dir(source_dir, target_dir):
-    if os.path.exists(source_dir) and os.path.exists(target_dir):
-        for entry in os.listdir(source_dir):
-            new_source = os.path.join(source_dir, entry)
-            if os.path.isfile(new_source):
-                new_target = target_dir
-                shutil.copy(new_source, new_target)
-            else:
-                new_target = os.path.join(target_dir, entry)
-                os.mkdir(new_target)
-                copy_dir(new_source, new_target)       
-                print(f"Copying file: {new_source}")
-    else:
-        raise Exception('Directory does not exist')
+import sys
+import logging
+import argparse
+import cProfile
+import instrument
+from instrument import BuildProfile
+from doccache import DocumentCache
+from build import explain
+from client import SOCKET_PATH
+from daemon import BuildDaemon
+from sitebuild import (
+    Site,
+    SiteConfig
+)
+
+logger = logging.getLogger(__name__)
+
+
+def site_config(args):
+    return SiteConfig(
+        incremental=args.incremental or args.daemon,
+        staged=args.staged,
+        workers=args.workers,
+        async_io=args.async_io,
+        hardlink=args.hardlink,
+        compress=args.compress,
+        compress_workers=args.compress_workers,
+        cache=args.cache,
+        cache_mb=args.cache_mb,
+        memo_blocks=args.memo_blocks,
+        site_url=args.site_url,
+        site_title=args.site_title,
+        site_author=args.site_author,
+        search=args.search,
+    )
+
+
+def build(args):
+    result = Site(site_config(args)).build()
+    logger.info(result)
+    return result
+
 
 def main():
-    source_dir = "static"
-    target_dir = "public"
-    # TODO: Añadir: si existe
-    # We clean up the directory so test can make sense
-    shutil.rmtree(target_dir)
-    os.mkdir(target_dir)
-    print(f"Created folder: {target_dir}")
-    copy_dir(source_dir, target_dir)
-    # Recursive generation of html pages
-    generate_pages_recursive("content", "template.html", "public")
-
-main()
+    parser = argparse.ArgumentParser(description="Static site generator")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Keep the output directory and only render pages whose inputs changed"
+    )
+    parser.add_argument(
+        "--staged", action="store_true",
+        help="Build into a sibling directory and publish it by swapping the public symlink "
+             "(with --incremental, unchanged files are hardlinked from the previous build)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of processes rendering pages (0 uses every CPU core)"
+    )
+    parser.add_argument(
+        "--async-io", action="store_true",
+        help="Read sources ahead and write pages from I/O threads while workers render (for slow storage)"
+    )
+    parser.add_argument(
+        "--compress", action="store_true",
+        help="Write .gz (and .br when brotli is installed) siblings of changed text assets"
+    )
+    parser.add_argument(
+        "--compress-workers", type=int, default=0,
+        help="Number of threads compressing assets (0, the default, uses every CPU core)"
+    )
+    parser.add_argument(
+        "--hardlink", action="store_true",
+        help="Hardlink static files into the output instead of copying them"
+    )
+    parser.add_argument(
+        "--cache", action="store_true",
+        help="Reuse the parsed content of unchanged markdown across builds (.build/documents)"
+    )
+    parser.add_argument(
+        "--cache-mb", type=float, default=256,
+        help="Size limit of the document cache; least recently used entries go first"
+    )
+    parser.add_argument(
+        "--clear-cache", action="store_true",
+        help="Empty the document cache before building"
+    )
+    parser.add_argument(
+        "--memo-blocks", type=int, default=0, metavar="N",
+        help="Reuse the HTML of up to N recently rendered blocks repeated across pages"
+    )
+    parser.add_argument(
+        "--site-url", type=str, default=None, metavar="URL",
+        help="Base URL of the published site; writes sitemap.xml and an Atom feed.xml from the page index"
+    )
+    parser.add_argument(
+        "--site-title", type=str, default=None,
+        help="Title of feed.xml (defaults to the title of index.html)"
+    )
+    parser.add_argument(
+        "--site-author", type=str, default=None,
+        help="Author named in feed.xml (defaults to the feed title)"
+    )
+    parser.add_argument(
+        "--search", action="store_true",
+        help="Write a sharded full-text search index to public/_search (queried by server.py /_search)"
+    )
+    parser.add_argument(
+        "--explain", type=str, default=None, metavar="PATH",
+        help="Instead of building, show the inputs of a page or the pages that depend on a file"
+    )
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="Stay resident with warm caches and build on requests from src/client.py (implies --incremental)"
+    )
+    parser.add_argument(
+        "--socket", type=str, default=SOCKET_PATH,
+        help="Unix socket the daemon listens on"
+    )
+    parser.add_argument(
+        "--quiet", action="store_true",
+        help="Only report warnings and errors instead of every file"
+    )
+    parser.add_argument(
+        "--profile", type=int, nargs="?", const=10, default=None, metavar="N",
+        help="Print time, bytes and calls per stage and the N slowest pages"
+    )
+    parser.add_argument(
+        "--trace", type=str, default=None, metavar="FILE",
+        help="Write a Chrome trace-event file of every stage"
+    )
+    parser.add_argument(
+        "--cprofile", type=str, default=None, metavar="FILE",
+        help="Run the build under cProfile and save the stats"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(message)s", level=logging.WARNING if args.quiet else logging.INFO)
+    if args.explain:
+        config = SiteConfig()
+        print("\n".join(explain(
+            args.explain, config.content_dir, config.template_path, config.target_dir, config.manifest_path
+        )))
+        return
+    if args.clear_cache:
+        cache_dir = SiteConfig().document_cache_dir
+        DocumentCache(cache_dir).clear()
+        logger.info(f"Cleared the document cache: {cache_dir}")
+    if args.daemon:
+        BuildDaemon(Site(site_config(args)), args.socket).serve_forever()
+        return
+    profile = None
+    if args.profile is not None or args.trace:
+        profile = BuildProfile(trace=bool(args.trace))
+        instrument.activate(profile)
+    if args.cprofile:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(build, args)
+        profiler.dump_stats(args.cprofile)
+    else:
+        result = build(args)
+    if profile is not None:
+        instrument.deactivate()
+        if args.profile is not None:
+            print(profile.report(args.profile))
+        if args.trace:
+            profile.write_chrome_trace(args.trace)
+    if not result.ok:
+        sys.exit(1)
+
+# Guarded so that process pool workers importing this module do not start a build
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+
+# Bump whenever a change in the generator alters the rendered output,
+# so that incremental builds know every page has to be rendered again
+GENERATOR_VERSION = "1"
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:  # Content hashes of build inputs, reused while a file keeps its mtime and size
+
+    def __init__(self, entries=None, stats=None):
+        self.entries = entries if entries is not None else {}  # path -> [mtime_ns, size, hash] from the last build
+        self.stats = stats if stats is not None else {}        # path -> stat result already known from a scan
+        self.used = {}                                         # The entries of the files hashed in this build
+
+    def hash(self, path):
+        if path in self.used:
+            return self.used[path][2]
+        stat = self.stats.get(path) or os.stat(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            digest = entry[2]
+        else:
+            digest = hash_file(path)
+        self.used[path] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+
+class BuildManifest:  # Dependency graph of the previous build: the inputs of every page
+
+    def __init__(self, version=None, pages=None, files=None, output=None):
+        self.version = version
+        self.output = output                                # Absolute output directory the pages were built for
+        self.files = files if files is not None else {}    # HashCache entries of every input
+        self.pages = pages if pages is not None else {}    # source path -> {"dest": ..., "inputs": {path: hash}}
+        # with dest relative to the output directory, which can move between builds
+
+    @classmethod
+    def load(cls, path):
+        # A missing or unreadable manifest just means "nothing is up to date"
+        try:
+            with open(path, 'r') as manifest_file:
+                data = json.load(manifest_file)
+        except (OSError, ValueError):
+            return cls()
+        return cls(data.get("version"), data.get("pages"), data.get("files"), data.get("output"))
+
+    def save(self, path):
+        manifest_dir = os.path.dirname(path)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+        data = {
+            "version": self.version,
+            "output": self.output,
+            "pages": self.pages,
+            "files": self.files,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as manifest_file:
+            json.dump(data, manifest_file, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def is_compatible(self, output_dir):
+        # Records of another generator version, or of a build into another directory
+        # sharing the state directory, say nothing about the pages in output_dir
+        return self.version == GENERATOR_VERSION and self.output == os.path.abspath(output_dir)
+
+    def changed_inputs(self, source, inputs):
+        # Inputs of the page whose hash differs from the previous build, or that it did not use
+        previous = self.pages.get(source, {}).get("inputs", {})
+        changed = [path for path, input_hash in inputs.items() if previous.get(path) != input_hash]
+        changed.extend(path for path in previous if path not in inputs)
+        return changed
+
+    def is_fresh(self, source, dest, inputs, target_dir):
+        entry = self.pages.get(source)
+        if entry is None:
+            return False
+        return (
+            entry.get("inputs") == inputs
+            and entry["dest"] == os.path.relpath(dest, target_dir)
+            and os.path.exists(dest)
+        )
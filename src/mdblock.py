@@ -1,14 +1,28 @@
+import io
 import os
+import time
+import logging
+import instrument
 from textnode import (
     text_to_textnodes,
     textnode_to_html_node
 )
 from enum import Enum
+from collections import OrderedDict
+from contextlib import contextmanager
 from htmlnode import (
+    LeafNode,
     ParentNode,
 )
+from output import AtomicOutput
+from template import load_template
 import re
 
+logger = logging.getLogger(__name__)
+
+# Sources at least this large are converted block by block into the output file
+STREAM_MIN_BYTES = 4 * 1024 * 1024
+
 
 class BlockType(Enum):
     PARA = "paragraph"
@@ -19,7 +33,44 @@ class BlockType(Enum):
     OL = "ordered list"
 
 
+HEADING_PATTERN = re.compile(r'#{1,6} ')
+HEAD_LEVEL_PATTERN = re.compile(r'\s*(#+)\s')
+QUOTE_BLOCK_PATTERN = re.compile(r'>[^\n]*(?:\n>[^\n]*)*')
+UNORDERED_LIST_PATTERN = re.compile(r'[*-] [^\n]*(?:\n[*-] [^\n]*)*')
+UNORDERED_ITEM_PREFIX = re.compile(r'^\s*[-*]\s+')
+ORDERED_ITEM_PREFIX = re.compile(r'^\s*\d+\.\s+')
+HEADING_PREFIX = re.compile(r'^#{1,6}\s*')
+CODE_FENCES = re.compile(r'^\s*```(?:.*\n)?|(?:\n)?```\s*$', flags=re.DOTALL)
+QUOTE_PREFIX = re.compile(r'^\s*> ?', flags=re.MULTILINE)
+
+
 def block_to_block_type(markdown):
+    # The first character decides which single check can still apply,
+    # so each block is scanned at most once
+    block = markdown.strip()
+    if not block:
+        return BlockType.PARA
+    first = block[0]
+    if first == '#':
+        if HEADING_PATTERN.match(block):
+            return BlockType.HEAD
+    elif first == '`':
+        if is_code_block(block):
+            return BlockType.CODE
+    elif first == '>':
+        if QUOTE_BLOCK_PATTERN.fullmatch(block):
+            return BlockType.QUOTE
+    elif first == '*' or first == '-':
+        if UNORDERED_LIST_PATTERN.fullmatch(block):
+            return BlockType.UL
+    elif first == '1':
+        if is_ordered_list(block):
+            return BlockType.OL
+    return BlockType.PARA
+
+
+def block_to_block_type_chained(markdown):
+    # The original predicate chain, kept as the reference behaviour for block_to_block_type
     block = markdown.strip()
     if is_heading(block):
         return BlockType.HEAD
@@ -34,19 +85,46 @@ def block_to_block_type(markdown):
     else:
         return BlockType.PARA
 
+
 def create_mdblock(block):
     block_type = block_to_block_type(block)
     match block_type:
         case BlockType.HEAD:
-            return MDHead(block)
+            return MDHead(block, block_type)
         case BlockType.OL | BlockType.UL:
-            return MDList(block)
+            return MDList(block, block_type)
         case _:
-            return MDFlatBlock(block)
+            return MDFlatBlock(block, block_type)
 
 
 def extract_title(markdown):
-    blocks = markdown_to_blocks(markdown)
+    return find_title(markdown_to_blocks(markdown))
+
+
+def extract_title_from_file(path):
+    # Reads blocks only until the first level 1 heading
+    with open(path, 'r') as origin_file:
+        return find_title(read_blocks(origin_file))
+
+
+def block_text(md_block):
+    # The text of the TextNodes an MDBlock renders, as the search index tokenizes it
+    nodes = md_block.nodes
+    if nodes and isinstance(nodes[0], list):
+        nodes = [node for item in nodes for node in item]
+    return " ".join(node.text for node in nodes)
+
+
+class PageText:  # The title and the block texts of a page, collected while it renders
+
+    __slots__ = ("title", "blocks")
+
+    def __init__(self):
+        self.title = ""
+        self.blocks = []
+
+
+def find_title(blocks):
     for block in blocks:
         if is_heading(block):
             if get_head_level(block) == 1:
@@ -54,51 +132,96 @@ def extract_title(markdown):
     return ""
 
 
-def generate_page(from_path, template_path, dest_path):
+def generate_page(from_path, template_path, dest_path, cache=None, page_text=None):
+    # Returns True if dest_path changed, False if it already held this page.
+    # A PageText, when given, receives the title and the text of the page
         # 1. "Path does not exist" exceptions
     if not (os.path.exists(from_path)):
         raise Exception("Origin path does not exist")
     if not os.path.exists(template_path):
         raise Exception("Template path does not exist")
         # 2. HTML generation
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path, 'r') as origin_file:
-        markdown = origin_file.read()
-    with open(template_path, 'r') as template_file:
-        html_template = template_file.read()
-    title = extract_title(markdown)
-    generated_html = html_template.replace("{{ Title }}", title)
-    content = markdown_to_html_node(markdown).to_html()
-    generated_html = generated_html.replace("{{ Content }}", content)
-        # 3. Generated page gets written
-    target_dir = os.path.dirname(dest_path)
-    if not os.path.exists(target_dir):
-        print(f"Creating directory: {target_dir}")
-        os.makedirs(target_dir)
-    with open(dest_path, 'w') as generated_file:
-        generated_file.write(generated_html)
-
-
-def generate_pages_recursive(source_dir, template_path, target_dir):
-    if os.path.exists(source_dir) and os.path.exists(target_dir):
-        for entry in os.listdir(source_dir):
-            new_source = os.path.join(source_dir, entry)
-            if os.path.isfile(new_source) and entry.endswith(".md"):
-                html_filename = entry.replace(".md", ".html")
-                new_target = os.path.join(target_dir, html_filename)
-                generate_page(new_source, template_path, new_target)
+    logger.info(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    profile = instrument.active_profile()
+    with instrument.page(from_path):
+        template = load_template(template_path)
+        source_size = os.path.getsize(from_path)
+        if source_size >= STREAM_MIN_BYTES:
+            # Too large to hold in memory: the content is parsed while it is written,
+            # so its time shows up in the serialize stage
+            if profile is not None:
+                profile.add_bytes("read", source_size)
+            with instrument.stage("extract_title"):
+                title = extract_title_from_file(from_path)
+            content = MarkdownStream(from_path, page_text.blocks if page_text is not None else None)
+        else:
+            with instrument.stage("read"):
+                with open(from_path, 'r') as origin_file:
+                    markdown = origin_file.read()
+            if profile is not None:
+                profile.add_bytes("read", len(markdown))
+            title, content = parse_document(markdown, cache, page_text.blocks if page_text is not None else None)
+            # 3. Generated page gets streamed to its file
+        target_dir = os.path.dirname(dest_path)
+        if not os.path.exists(target_dir):
+            logger.info(f"Creating directory: {target_dir}")
+            os.makedirs(target_dir)
+        # Written to a temporary file that replaces dest_path only if the page changed
+        output = AtomicOutput(dest_path)
+        with output as generated_file:
+            if profile is None:
+                template.write(generated_file, {"Title": title, "Content": content})
             else:
-                new_target = os.path.join(target_dir, entry)
-                os.mkdir(new_target)
-                generate_pages_recursive(new_source, template_path, new_target)       
-                print(f"Copying file: {new_source}")
-    else:
-        raise Exception('Directory does not exist')
+                # Serialization and template fill stream into the file, so the time spent
+                # inside file writes is split out as its own stage
+                writer = instrument.TimedWriter(generated_file)
+                start = time.perf_counter()
+                template.write(writer, {"Title": title, "Content": content})
+                elapsed = time.perf_counter() - start
+                profile.record("serialize", start, elapsed - writer.seconds, writer.chars)
+                profile.record("write", start, writer.seconds, writer.chars)
+    if page_text is not None:
+        page_text.title = title
+    return output.changed
+
+
+def parse_document(markdown, cache=None, texts=None):
+    # Returns the title and the content, as an HTMLNode or as an HTML string from the cache.
+    # texts, when given, is extended with the text of every block
+    cached = None
+    if cache is not None:
+        with instrument.stage("cache_lookup"):
+            key = cache.key(markdown)
+            cached = cache.get(key)
+    # An entry stored without the block texts is parsed again when they are wanted
+    if cached is not None and (texts is None or cached[2] is not None):
+        title, content, cached_texts = cached
+        if texts is not None:
+            texts.extend(cached_texts)
+        return title, content
+    with instrument.stage("extract_title"):
+        title = extract_title(markdown)
+    content = markdown_to_html_node(markdown, texts)
+    if cache is not None:
+        # The cache stores the content string, so it is serialized before the page
+        content = content.to_html()
+        cache.put(key, title, content, texts)
+    return title, content
+
+
+def render_document(markdown, template_path, cache=None, page_text=None):
+    # The page generate_page would write for markdown, as a string
+    title, content = parse_document(markdown, cache, page_text.blocks if page_text is not None else None)
+    if page_text is not None:
+        page_text.title = title
+    if not isinstance(content, str):
+        content = content.to_html()
+    return load_template(template_path).render({"Title": title, "Content": content})
 
 
 def get_head_level(block):
     # Usar una expresión regular para encontrar el nivel del encabezado
-    match = re.match(r'^\s*(#+)\s', block)
+    match = HEAD_LEVEL_PATTERN.match(block)
     if match:
         return len(match.group(1))
     else:
@@ -122,7 +245,7 @@ def get_html_tag(block_type):
 
 
 def is_heading(block):
-    return bool(re.match(r'^#{1,6} ', block))
+    return bool(HEADING_PATTERN.match(block))
 
 
 def is_code_block(block):
@@ -134,13 +257,13 @@ def is_quote_block(block):
 
 
 def is_unordered_list(block):
-    return all(re.match(r'^[*-] ', line) for line in block.split('\n'))
+    return bool(UNORDERED_LIST_PATTERN.fullmatch(block))
 
 
 def is_ordered_list(block):
     lines = block.split('\n')
     for i, line in enumerate(lines, start=1):
-        if not re.match(r'^{idx}\. '.format(idx=i), line):
+        if not line.startswith(f"{i}. "):
             return False
     return True
 
@@ -155,18 +278,146 @@ def markdown_to_blocks(markdown):
     return stripped_blocks
 
 
+def read_blocks(stream):
+    # Yields the same blocks as markdown_to_blocks(stream.read()), holding one block at a time.
+    # Blocks end at runs of two or more newlines, i.e. at an empty line after the first one
+    lines = []
+    started = False
+    for line in stream:
+        if line == "\n" and started:
+            block = "".join(lines).strip()
+            if block != "":
+                yield block
+            lines.clear()
+        else:
+            lines.append(line)
+        started = True
+    block = "".join(lines).strip()
+    if block != "":
+        yield block
+
+
 """This one should make use of a lot of the previous functionality to convert a full markdown document into an HTMLNode.
 That top-level HTMLNode should just be a <div>, where each child is a block of the document. Each block should have its own "inline" children.
 """
 
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    html_children_nodes = [create_mdblock(block).to_html_node() for block in blocks]
+def markdown_to_html_node(markdown, texts=None):
+    # texts, when given, is extended with the text of every block
+    with instrument.stage("split_blocks"):
+        blocks = markdown_to_blocks(markdown)
+    if _block_memo is not None:
+        with instrument.stage("render_blocks"):
+            # Each child is the already rendered HTML of its block
+            html_children_nodes = [LeafNode(None, _block_memo.render(block, texts)) for block in blocks]
+        return ParentNode("div", html_children_nodes)
+    with instrument.stage("parse_inline"):
+        md_blocks = [create_mdblock(block) for block in blocks]
+    if texts is not None:
+        texts.extend(block_text(md_block) for md_block in md_blocks)
+    with instrument.stage("build_nodes"):
+        html_children_nodes = [md_block.to_html_node() for md_block in md_blocks]
     html_parent_node = ParentNode("div", html_children_nodes)
     return html_parent_node
 
 
+class MarkdownStream:  # The content <div> of a markdown file, converted block by block as it is written
+
+    def __init__(self, path, texts=None):
+        self.path = path
+        self.texts = texts                  # Extended with the text of every block as it is written
+
+    def write_html(self, stream):
+        stream.write("<div>")
+        with open(self.path, 'r') as origin_file:
+            for block in read_blocks(origin_file):
+                if _block_memo is not None:
+                    stream.write(_block_memo.render(block, self.texts))
+                    continue
+                md_block = create_mdblock(block)
+                md_block.to_html_node().write_html(stream)
+                if self.texts is not None:
+                    self.texts.append(block_text(md_block))
+        stream.write("</div>")
+
+    def to_html(self):
+        buffer = io.StringIO()
+        self.write_html(buffer)
+        return buffer.getvalue()
+
+
+class BlockMemo:  # LRU of rendered HTML fragments (and block texts) keyed on the raw block text
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.fragments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, block, texts=None):
+        # texts, when given, gets the text of the block appended; it is only
+        # kept in the memo once some page asked for it
+        entry = self.fragments.get(block)
+        if entry is not None:
+            self.fragments.move_to_end(block)
+            self.hits += 1
+            if texts is not None:
+                if entry[1] is None:
+                    entry[1] = block_text(create_mdblock(block))
+                texts.append(entry[1])
+            return entry[0]
+        self.misses += 1
+        md_block = create_mdblock(block)
+        entry = [md_block.to_html_node().to_html(), None]
+        if texts is not None:
+            entry[1] = block_text(md_block)
+            texts.append(entry[1])
+        self.fragments[block] = entry
+        if len(self.fragments) > self.max_entries:
+            self.fragments.popitem(last=False)
+        return entry[0]
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return f"{self.hits} hits, {self.misses} misses ({self.hit_rate():.1%} hit rate)"
+
+
+_block_memo = None
+
+
+def enable_block_memo(max_entries=4096):
+    # Every page rendered afterwards in this process shares one memo of that size
+    global _block_memo
+    if _block_memo is None or _block_memo.max_entries != max_entries:
+        _block_memo = BlockMemo(max_entries)
+    return _block_memo
+
+
+def disable_block_memo():
+    global _block_memo
+    _block_memo = None
+
+
+def active_block_memo():
+    return _block_memo
+
+
+@contextmanager
+def use_block_memo(memo):
+    # Pages rendered in the with block use memo (or none when it is None);
+    # the memo that was active before is restored afterwards
+    global _block_memo
+    previous = _block_memo
+    _block_memo = memo
+    try:
+        yield memo
+    finally:
+        _block_memo = previous
+
+
 def mdstrip(block, block_type):
     match block_type:
         case BlockType.PARA:
@@ -191,17 +442,17 @@ def mdstrip(block, block_type):
 
 def remove_md_heading_hashes(heading):
     # Usa una expresión regular para quitar entre 1 y 6 almohadillas al principio del heading
-    return re.sub(r'^#{1,6}\s*', '', heading)
+    return HEADING_PREFIX.sub('', heading)
 
 
 def remove_md_code_prefix(code):
     # Quitar los tres backticks al principio y al final del bloque de código
-    return re.sub(r'^\s*```(?:.*\n)?|(?:\n)?```\s*$', '', code, flags=re.DOTALL)
+    return CODE_FENCES.sub('', code)
 
 
 def remove_md_quote_prefix(quote):
     # Quitar el símbolo de cita (>) al principio de cada línea en el bloque de texto
-    return re.sub(r'^\s*> ?', '', quote, flags=re.MULTILINE)
+    return QUOTE_PREFIX.sub('', quote)
 
 
 def remove_md_unordered_list_prefix(ulist):
@@ -209,7 +460,7 @@ def remove_md_unordered_list_prefix(ulist):
     items = ulist.splitlines()
     
     # Procesar cada línea para quitar el guión o asterisco
-    cleaned_items = [re.sub(r'^\s*[-*]\s+', '', item) for item in items]
+    cleaned_items = [UNORDERED_ITEM_PREFIX.sub('', item) for item in items]
     
     return cleaned_items
 
@@ -219,18 +470,20 @@ def remove_md_ordered_list_prefix(olist):
     items = olist.splitlines()
     
     # Procesar cada línea para quitar el número seguido de un punto
-    cleaned_items = [re.sub(r'^\s*\d+\.\s+', '', item) for item in items]
+    cleaned_items = [ORDERED_ITEM_PREFIX.sub('', item) for item in items]
     
     return cleaned_items
 
 
 class MDBlock:  # Markdown Block
 
-    def __init__(self, block):
+    __slots__ = ("type", "nodes")
+
+    def __init__(self, block, block_type=None):
         # Check for empty blocks
         if block is None or block == "":
             raise Exception("Invalid text block: empty or none")
-        self.type = block_to_block_type(block)
+        self.type = block_type if block_type is not None else block_to_block_type(block)
         self.nodes = []
 
     def __eq__(self, block):
@@ -253,8 +506,11 @@ class MDBlock:  # Markdown Block
                 
     
 class MDList(MDBlock):
-    def __init__(self, block):
-        super().__init__(block)
+
+    __slots__ = ()
+
+    def __init__(self, block, block_type=None):
+        super().__init__(block, block_type)
         item_list = mdstrip(block, self.type)
         for item in item_list:
             item_nodes = text_to_textnodes(item)     
@@ -271,8 +527,11 @@ class MDList(MDBlock):
 
 
 class MDFlatBlock(MDBlock):
-    def __init__(self, block):
-        super().__init__(block)
+
+    __slots__ = ()
+
+    def __init__(self, block, block_type=None):
+        super().__init__(block, block_type)
         clean_block = mdstrip(block, self.type)
         self.nodes = text_to_textnodes(clean_block)
 
@@ -283,8 +542,11 @@ class MDFlatBlock(MDBlock):
 
 
 class MDHead(MDBlock):
-    def __init__(self, block):
-        super().__init__(block)
+
+    __slots__ = ("head_level",)
+
+    def __init__(self, block, block_type=None):
+        super().__init__(block, block_type)
         self.head_level = get_head_level(block)
         clean_block = mdstrip(block, self.type)
         self.nodes = text_to_textnodes(clean_block)
@@ -0,0 +1,51 @@
+import os
+
+
+def same_content(first_path, second_path, chunk_size=1 << 16):
+    # Sizes first, so a changed page of a different length is never read back
+    try:
+        if os.path.getsize(first_path) != os.path.getsize(second_path):
+            return False
+        with open(first_path, 'rb') as first, open(second_path, 'rb') as second:
+            while True:
+                first_chunk = first.read(chunk_size)
+                if first_chunk != second.read(chunk_size):
+                    return False
+                if not first_chunk:
+                    return True
+    except FileNotFoundError:
+        return False
+
+
+class AtomicOutput:  # File written through a temporary sibling that replaces it only if it differs
+
+    def __init__(self, path, mode='w'):
+        self.path = path
+        self.mode = mode                # 'wb' for binary files
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.changed = None             # Known once the with block exits
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.tmp_path, self.mode)
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+        if exc_type is not None or same_content(self.tmp_path, self.path):
+            # An identical page keeps its mtime, so uploads and caches see no change
+            os.remove(self.tmp_path)
+            self.changed = False
+        else:
+            # Readers of path see either the old or the new file, never a partial one
+            os.replace(self.tmp_path, self.path)
+            self.changed = True
+        return False
+
+
+def write_if_changed(path, text):
+    # Returns True if path was written, False if it already held text
+    output = AtomicOutput(path)
+    with output as output_file:
+        output_file.write(text)
+    return output.changed
@@ -0,0 +1,165 @@
+import os
+import time
+import sqlite3
+from datetime import (
+    datetime,
+    timezone
+)
+from xml.sax.saxutils import escape
+from manifest import hash_file
+from mdblock import extract_title_from_file
+from output import write_if_changed
+
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+FEED_ENTRIES = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    path TEXT PRIMARY KEY,      -- Output path relative to the output directory, with / separators
+    source TEXT NOT NULL,
+    title TEXT NOT NULL,
+    size INTEGER NOT NULL,      -- Bytes of the rendered page
+    hash TEXT NOT NULL,         -- SHA-256 of the rendered page
+    created REAL NOT NULL,      -- When the page was first indexed
+    modified REAL NOT NULL      -- When its rendered content last changed
+)
+"""
+
+
+class PageIndex:  # Every rendered page of the site, kept in SQLite between builds
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(SCHEMA)
+        self.changed = False            # Whether this session added, altered or removed a page
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def paths(self):
+        return {path for path, in self.db.execute("SELECT path FROM pages")}
+
+    def update(self, path, source, title, size, digest, now=None):
+        # Records a rendered page; the modified date only moves when its content does
+        now = now if now is not None else time.time()
+        row = self.db.execute("SELECT source, title, hash FROM pages WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            self.db.execute(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)", (path, source, title, size, digest, now, now)
+            )
+        elif row != (source, title, digest):
+            modified = now if row[2] != digest else None
+            self.db.execute(
+                "UPDATE pages SET source = ?, title = ?, size = ?, hash = ?, modified = COALESCE(?, modified) "
+                "WHERE path = ?",
+                (source, title, size, digest, modified, path),
+            )
+        else:
+            return False
+        self.changed = True
+        return True
+
+    def remove(self, paths):
+        removed = 0
+        for path in paths:
+            removed += self.db.execute("DELETE FROM pages WHERE path = ?", (path,)).rowcount
+        if removed:
+            self.changed = True
+        return removed
+
+    def pages(self, order="path", limit=-1):
+        # (path, title, created, modified) rows
+        return self.db.execute(
+            f"SELECT path, title, created, modified FROM pages ORDER BY {order} LIMIT ?", (limit,)
+        ).fetchall()
+
+
+def index_path(dest, target_dir):
+    return os.path.relpath(dest, target_dir).replace(os.sep, "/")
+
+
+def index_pages(index, pages, target_dir):
+    # Records the (source, destination) pages from their rendered output, reading each
+    # source only up to its title. Returns the number of index rows that changed
+    updated = 0
+    for source, dest in pages:
+        stat = os.stat(dest)
+        title = extract_title_from_file(source)
+        updated += index.update(index_path(dest, target_dir), source, title, stat.st_size, hash_file(dest))
+    return updated
+
+
+def page_url(path, site_url):
+    # index.html pages are linked as their directory
+    if path == "index.html" or path.endswith("/index.html"):
+        path = path[:-len("index.html")]
+    return site_url.rstrip("/") + "/" + path
+
+
+def iso_date(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+def render_sitemap(pages, site_url):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for path, _, _, modified in pages:
+        lines.append(
+            f"<url><loc>{escape(page_url(path, site_url))}</loc><lastmod>{iso_date(modified)}</lastmod></url>"
+        )
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def render_atom(pages, site_url, title, author=None):
+    # An Atom feed of pages, newest first. Atom requires an author; the feed-level one,
+    # the site title when there is no author, covers every entry
+    updated = max((modified for _, _, _, modified in pages), default=0)
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"<title>{escape(title)}</title>",
+        f"<author><name>{escape(author or title)}</name></author>",
+        f'<link href="{escape(page_url(FEED_NAME, site_url))}" rel="self"/>',
+        f'<link href="{escape(page_url("", site_url))}"/>',
+        f"<id>{escape(page_url('', site_url))}</id>",
+        f"<updated>{iso_date(updated)}</updated>",
+    ]
+    for path, page_title, created, modified in pages:
+        url = escape(page_url(path, site_url))
+        lines.append(
+            f'<entry><title>{escape(page_title or path)}</title><link href="{url}"/><id>{url}</id>'
+            f"<published>{iso_date(created)}</published><updated>{iso_date(modified)}</updated></entry>"
+        )
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+
+def write_feeds(index, target_dir, site_url, title=None, author=None):
+    # Writes sitemap.xml and the Atom feed.xml from the index alone, without reading any page
+    # Returns the paths that changed
+    if title is None:
+        row = index.db.execute("SELECT title FROM pages WHERE path = 'index.html'").fetchone()
+        title = row[0] if row and row[0] else site_url
+    outputs = (
+        (SITEMAP_NAME, render_sitemap(index.pages(), site_url)),
+        (FEED_NAME, render_atom(index.pages("created DESC, path", FEED_ENTRIES), site_url, title, author)),
+    )
+    written = []
+    for name, text in outputs:
+        path = os.path.join(target_dir, name)
+        if write_if_changed(path, text):
+            written.append(path)
+    return written
@@ -0,0 +1,71 @@
+import os
+import shutil
+import time
+import logging
+from scan import scan_tree
+
+logger = logging.getLogger(__name__)
+
+
+def stage_dirs(target_dir):
+    # Sibling build directories of target_dir (public.build-<ns>), oldest first
+    parent, name = os.path.split(os.path.abspath(target_dir))
+    prefix = name + ".build-"
+    stages = [entry for entry in os.listdir(parent) if entry.startswith(prefix) and entry[len(prefix):].isdigit()]
+    return [os.path.join(parent, entry) for entry in sorted(stages, key=lambda entry: int(entry[len(prefix):]))]
+
+
+def link_tree(source_dir, target_dir):
+    # Fills target_dir with hardlinks to every file of source_dir, copying where linking fails.
+    # Every later write into target_dir replaces files instead of editing them in place,
+    # so the linked source_dir is never modified. Returns the number of files linked
+    linked = 0
+    for relative_path in scan_tree(source_dir):
+        source_path = os.path.join(source_dir, relative_path)
+        dest_path = os.path.join(target_dir, relative_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        try:
+            os.link(source_path, dest_path)
+            linked += 1
+        except OSError:
+            shutil.copy2(source_path, dest_path)
+    return linked
+
+
+def prepare_stage(target_dir, link_previous=False):
+    # Creates an empty sibling build directory, or one holding hardlinks of the current build
+    stage_dir = f"{os.path.normpath(target_dir)}.build-{time.time_ns()}"
+    os.makedirs(stage_dir)
+    if link_previous and os.path.isdir(target_dir):
+        linked = link_tree(target_dir, stage_dir)
+        logger.info(f"Staging into {stage_dir}, {linked} file(s) linked from the previous build")
+    else:
+        logger.info(f"Staging into {stage_dir}")
+    return stage_dir
+
+
+def publish_stage(stage_dir, target_dir, keep=1):
+    # Points the target_dir symlink at stage_dir with one rename, so the site switches
+    # from the previous build to the new one at once. Deletes all but the keep newest
+    # earlier builds
+    link_path = f"{target_dir}.link-{os.getpid()}"
+    os.symlink(os.path.basename(stage_dir), link_path)
+    if os.path.isdir(target_dir) and not os.path.islink(target_dir):
+        # A directory cannot be swapped for a symlink in one step; this happens once, the first
+        # time a plain build directory is replaced
+        retired = f"{os.path.normpath(target_dir)}.build-0"
+        os.rename(target_dir, retired)
+        logger.warning(f"Moved the existing {target_dir} to {retired} to publish builds as a symlink")
+    os.replace(link_path, target_dir)
+    logger.info(f"Published {stage_dir} as {target_dir}")
+    previous = [stage for stage in stage_dirs(target_dir) if stage != os.path.abspath(stage_dir)]
+    for stage in previous[:max(0, len(previous) - keep)]:
+        shutil.rmtree(stage)
+
+
+def remove_stages(target_dir):
+    # Turns a published symlink back into nothing, for builds that write target_dir in place
+    if os.path.islink(target_dir):
+        os.remove(target_dir)
+    for stage in stage_dirs(target_dir):
+        shutil.rmtree(stage)
@@ -0,0 +1,56 @@
+import os
+import time
+
+
+def scan_tree(root):
+    # Relative paths of every file under root, with their stat results, in the order of a
+    # depth-first walk over sorted directory listings. scandir entries carry their type,
+    # so only regular files cost a stat call
+    files = {}
+    if os.path.exists(root):
+        scan_dir(root, "", files)
+    return files
+
+
+def scan_dir(directory, prefix, files):
+    # Paths are concatenated rather than os.path.join'ed: on big trees join costs more than the syscalls
+    with os.scandir(directory) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir():
+            scan_dir(entry.path, prefix + entry.name + os.sep, files)
+        elif entry.is_file():
+            files[prefix + entry.name] = entry.stat()
+
+
+def find_pages(content_dir, target_dir, files):
+    # Sorted (source .md, destination .html) pairs for the scan_tree files of content_dir
+    source_prefix = os.path.join(content_dir, "")
+    target_prefix = os.path.join(target_dir, "")
+    jobs = []
+    for relative_path in files:
+        if relative_path.endswith(".md"):
+            relative_dir, separator, filename = relative_path.rpartition(os.sep)
+            html_path = relative_dir + separator + filename.replace(".md", ".html")
+            jobs.append((source_prefix + relative_path, target_prefix + html_path))
+    return jobs
+
+
+class SiteScan:  # One walk of the content and static trees, shared by every build stage
+
+    def __init__(self, content_dir, static_dir, target_dir):
+        start = time.perf_counter()
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.content = scan_tree(content_dir)           # relative path -> stat result
+        self.static = scan_tree(static_dir)
+        self.page_jobs = find_pages(content_dir, target_dir, self.content)
+        source_prefix = os.path.join(content_dir, "")
+        self.stats = {source_prefix + path: stat for path, stat in self.content.items()}
+        self.seconds = time.perf_counter() - start
+
+    def __repr__(self):
+        return (
+            f"Scanned {len(self.content) + len(self.static)} file(s) in {self.seconds * 1000:.1f} ms: "
+            f"{len(self.page_jobs)} page(s), {len(self.static)} static file(s)"
+        )
@@ -0,0 +1,384 @@
+import os
+import re
+import json
+import math
+import mmap
+import struct
+from mdblock import (
+    block_text,
+    create_mdblock,
+    get_head_level,
+    is_heading,
+    read_blocks,
+    remove_md_heading_hashes
+)
+from output import (
+    AtomicOutput,
+    write_if_changed
+)
+from pageindex import (
+    index_path,
+    page_url
+)
+
+# The index lives in <output>/_search: docs.json lists the pages, and each term is in the
+# shard named after the hex UTF-8 of its first SHARD_PREFIX characters, so a browser only
+# fetches the shards of the terms it looks up. No page or static file may be written there
+SEARCH_DIR = "_search"
+DOCS_NAME = "docs.json"
+SHARD_PREFIX = 2
+SHARD_SUFFIX = ".idx"
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_TERM_LENGTH = 64
+MAX_PREFIX_TERMS = 64
+
+# Shard layout, little endian:
+#   b"SRC1", term count N
+#   N + 1 pairs of u32 (term offset, postings offset); the last pair marks the ends
+#   the sorted UTF-8 terms, back to back
+#   per term, varints: document count, then (document id delta, term frequency) pairs
+SHARD_MAGIC = b"SRC1"
+SHARD_HEADER = struct.Struct("<4sI")
+SHARD_ENTRY = struct.Struct("<II")
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if 1 < len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def add_terms(terms, text):
+    for token in tokenize(text):
+        terms[token] = terms.get(token, 0) + 1
+
+
+def count_terms(texts):
+    # {term: frequency} of the block texts a page collected while it rendered
+    terms = {}
+    for text in texts:
+        add_terms(terms, text)
+    return terms
+
+
+def page_terms(path):
+    # The title and {term: frequency} of a markdown file the build did not render,
+    # read one block at a time
+    title = None
+    terms = {}
+    with open(path, 'r') as source_file:
+        for block in read_blocks(source_file):
+            if title is None and is_heading(block) and get_head_level(block) == 1:
+                title = remove_md_heading_hashes(block)
+            add_terms(terms, block_text(create_mdblock(block)))
+    return title or "", terms
+
+
+def check_search_dir(relative_paths):
+    # Fails when one of the output paths of a site falls in the index directory
+    prefix = SEARCH_DIR + os.sep
+    for path in relative_paths:
+        if path.startswith(prefix):
+            raise Exception(f"{path} would be written to {SEARCH_DIR}/, which is reserved for the search index")
+
+
+def shard_key(term):
+    return term[:SHARD_PREFIX].encode("utf-8").hex()
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def encode_shard(postings):
+    # postings: term -> {document id: frequency}
+    terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+    term_blob = bytearray()
+    posting_blob = bytearray()
+    table = bytearray()
+    for term in terms:
+        table += SHARD_ENTRY.pack(len(term_blob), len(posting_blob))
+        term_blob += term.encode("utf-8")
+        documents = postings[term]
+        encode_varint(len(documents), posting_blob)
+        previous = 0
+        for document in sorted(documents):
+            encode_varint(document - previous, posting_blob)
+            encode_varint(documents[document], posting_blob)
+            previous = document
+    table += SHARD_ENTRY.pack(len(term_blob), len(posting_blob))
+    return SHARD_HEADER.pack(SHARD_MAGIC, len(terms)) + table + term_blob + posting_blob
+
+
+class ShardReader:  # Term lookups straight from the bytes (or the mmap) of one shard
+
+    def __init__(self, data):
+        magic, self.count = SHARD_HEADER.unpack_from(data, 0)
+        if magic != SHARD_MAGIC:
+            raise ValueError("Not a search index shard")
+        self.data = data
+        self.terms_start = SHARD_HEADER.size + SHARD_ENTRY.size * (self.count + 1)
+        self.postings_start = self.terms_start + SHARD_ENTRY.unpack_from(data, self.entry(self.count))[0]
+
+    def entry(self, index):
+        return SHARD_HEADER.size + SHARD_ENTRY.size * index
+
+    def term(self, index):
+        start = SHARD_ENTRY.unpack_from(self.data, self.entry(index))[0]
+        end = SHARD_ENTRY.unpack_from(self.data, self.entry(index + 1))[0]
+        return bytes(self.data[self.terms_start + start:self.terms_start + end])
+
+    def postings(self, index):
+        position = self.postings_start + SHARD_ENTRY.unpack_from(self.data, self.entry(index))[1]
+        count, position = decode_varint(self.data, position)
+        documents = {}
+        document = 0
+        for _ in range(count):
+            delta, position = decode_varint(self.data, position)
+            frequency, position = decode_varint(self.data, position)
+            document += delta
+            documents[document] = frequency
+        return documents
+
+    def lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, term):
+        key = term.encode("utf-8")
+        index = self.lower_bound(key)
+        if index < self.count and self.term(index) == key:
+            return self.postings(index)
+        return {}
+
+    def with_prefix(self, prefix, limit=MAX_PREFIX_TERMS):
+        # (term, postings) of up to limit terms starting with prefix
+        key = prefix.encode("utf-8")
+        index = self.lower_bound(key)
+        found = []
+        while index < self.count and len(found) < limit:
+            term = self.term(index)
+            if not term.startswith(key):
+                break
+            found.append((term.decode("utf-8"), self.postings(index)))
+            index += 1
+        return found
+
+    def to_postings(self):
+        return {self.term(index).decode("utf-8"): self.postings(index) for index in range(self.count)}
+
+
+class SearchIndexWriter:  # Keeps the shards of <output>/search up to date, one changed page at a time
+
+    def __init__(self, target_dir, state_path, output_dir=None):
+        self.search_dir = os.path.join(target_dir, SEARCH_DIR)
+        self.state_path = state_path
+        self.output = os.path.abspath(output_dir if output_dir is not None else target_dir)
+        self.docs = []                  # document id -> [page path, title], None once removed
+        self.terms = {}                 # page path -> {term: frequency} as indexed
+        self.fresh = True               # Whether the shards on disk are ignored and rewritten from scratch
+        # Without the published docs.json (a full build emptied the output), or with the state
+        # of a build into another directory, start over
+        if os.path.exists(os.path.join(self.search_dir, DOCS_NAME)):
+            try:
+                with open(state_path, 'r') as state_file:
+                    state = json.load(state_file)
+                if state.get("output") == self.output:
+                    self.docs = state["docs"]
+                    self.terms = state["terms"]
+                    self.fresh = False
+            except (OSError, ValueError, KeyError):
+                pass
+        self.ids = {doc[0]: document for document, doc in enumerate(self.docs) if doc is not None}
+        self.touched = {}               # shard key -> {term: {document id: frequency or None to drop}}
+        self.changed = self.fresh
+
+    def touch(self, term, document, frequency):
+        self.touched.setdefault(shard_key(term), {}).setdefault(term, {})[document] = frequency
+
+    def remove(self, path):
+        document = self.ids.pop(path, None)
+        if document is None:
+            return False
+        for term in self.terms.pop(path):
+            self.touch(term, document, None)
+        self.docs[document] = None
+        self.changed = True
+        return True
+
+    def update(self, path, title, terms):
+        # Only the terms whose frequency changed touch a shard
+        document = self.ids.get(path)
+        if document is None:
+            document = self.ids[path] = len(self.docs)
+            self.docs.append(None)
+        previous = self.terms.get(path, {})
+        if self.docs[document] == [path, title] and previous == terms:
+            return
+        for term in previous:
+            if term not in terms:
+                self.touch(term, document, None)
+        for term, frequency in terms.items():
+            if previous.get(term) != frequency:
+                self.touch(term, document, frequency)
+        self.docs[document] = [path, title]
+        self.terms[path] = terms
+        self.changed = True
+
+    def save(self):
+        # Rewrites only the shards whose postings changed; returns their number
+        if not self.changed:
+            return 0
+        if self.fresh and os.path.isdir(self.search_dir):
+            # Only the files the writer owns; nothing else should be there, but it is not ours
+            for name in os.listdir(self.search_dir):
+                if name == DOCS_NAME or name.endswith(SHARD_SUFFIX):
+                    os.remove(os.path.join(self.search_dir, name))
+        self.fresh = False
+        os.makedirs(self.search_dir, exist_ok=True)
+        for key, changes in self.touched.items():
+            path = os.path.join(self.search_dir, key + SHARD_SUFFIX)
+            postings = {}
+            if os.path.exists(path):
+                with open(path, 'rb') as shard_file:
+                    postings = ShardReader(shard_file.read()).to_postings()
+            for term, documents in changes.items():
+                term_postings = postings.setdefault(term, {})
+                for document, frequency in documents.items():
+                    if frequency is None:
+                        term_postings.pop(document, None)
+                    else:
+                        term_postings[document] = frequency
+                if not term_postings:
+                    del postings[term]
+            if postings:
+                # Replaced, never written in place: a staged build may share the file with the live one
+                with AtomicOutput(path, 'wb') as shard_file:
+                    shard_file.write(encode_shard(postings))
+            elif os.path.exists(path):
+                os.remove(path)
+        written = len(self.touched)
+        self.touched = {}
+        write_if_changed(
+            os.path.join(self.search_dir, DOCS_NAME),
+            json.dumps({"prefix": SHARD_PREFIX, "docs": self.docs}, separators=(",", ":")),
+        )
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w') as state_file:
+            json.dump({"output": self.output, "docs": self.docs, "terms": self.terms}, state_file, separators=(",", ":"))
+        os.replace(tmp_path, self.state_path)
+        self.changed = False
+        return written
+
+
+def index_search_pages(writer, pages, target_dir, rendered=None):
+    # Adds the (source, destination) pages to writer, with the (title, terms) rendered
+    # collected for a source while it rendered; other sources are read and tokenized
+    rendered = rendered or {}
+    for source, dest in pages:
+        title, terms = rendered.get(source) or page_terms(source)
+        writer.update(index_path(dest, target_dir), title, terms)
+
+
+class SearchIndexReader:  # Answers queries from the memory-mapped shards of a built site
+
+    def __init__(self, search_dir):
+        self.search_dir = search_dir
+        self.shards = {}                # shard key -> ((mtime_ns, size, inode), ShardReader)
+        self.docs = None
+        self.docs_version = None
+
+    def shard(self, key):
+        path = os.path.join(self.search_dir, key + SHARD_SUFFIX)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.shards.pop(key, None)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        cached = self.shards.get(key)
+        if cached is None or cached[0] != version:
+            # The writer replaces shards, so a mapped file never changes under us
+            with open(path, 'rb') as shard_file:
+                cached = (version, ShardReader(mmap.mmap(shard_file.fileno(), 0, access=mmap.ACCESS_READ)))
+            self.shards[key] = cached
+        return cached[1]
+
+    def load_docs(self):
+        path = os.path.join(self.search_dir, DOCS_NAME)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if version != self.docs_version:
+            with open(path, 'r') as docs_file:
+                self.docs = json.load(docs_file)["docs"]
+            self.docs_version = version
+        return self.docs
+
+    def postings(self, term, prefix=False):
+        # {document id: frequency} of term, or of every term starting with it
+        shard = self.shard(shard_key(term))
+        if shard is None:
+            return []
+        if not prefix or len(term) < SHARD_PREFIX:
+            found = shard.lookup(term)
+            return [found] if found else []
+        return [documents for _, documents in shard.with_prefix(term)]
+
+    def search(self, query, limit=10):
+        # Pages containing every query word, the last one also as a prefix, best first.
+        # Returns (results, total) with results as {"url", "title", "score"} dicts
+        words = tokenize(query)
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        try:
+            docs = self.load_docs()
+        except (OSError, ValueError):
+            return [], 0
+        if not words:
+            return [], 0
+        live = sum(1 for doc in docs if doc is not None)
+        scores = None
+        for position, word in enumerate(words):
+            word_scores = {}
+            for documents in self.postings(word, prefix=position == len(words) - 1):
+                weight = math.log(1 + live / len(documents))
+                for document, frequency in documents.items():
+                    word_scores[document] = word_scores.get(document, 0.0) + frequency * weight
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {
+                    document: score + word_scores[document]
+                    for document, score in scores.items() if document in word_scores
+                }
+            if not scores:
+                return [], 0
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        results = []
+        for document, score in ranked[:limit]:
+            path, title = docs[document]
+            results.append({"url": page_url(path, ""), "title": title, "score": round(score, 4)})
+        return results, len(ranked)
@@ -0,0 +1,511 @@
+import os
+import time
+import shutil
+import logging
+import instrument
+from build import (
+    TEMPLATE_NAME,
+    PageBuildError,
+    RenderReport,
+    generate_pages_incremental,
+    generate_pages_parallel,
+    page_destination,
+    remove_output,
+    render_pages,
+    resolve_templates
+)
+from compress import (
+    precompress_dir,
+    update_variants
+)
+from doccache import DocumentCache
+from instrument import BuildProfile
+from manifest import (
+    BuildManifest,
+    HashCache
+)
+from mdblock import (
+    BlockMemo,
+    markdown_to_html_node,
+    render_document,
+    use_block_memo
+)
+from release import (
+    prepare_stage,
+    publish_stage,
+    remove_stages
+)
+from pageindex import (
+    SITEMAP_NAME,
+    PageIndex,
+    index_pages,
+    index_path,
+    write_feeds
+)
+from scan import SiteScan
+from search import (
+    DOCS_NAME,
+    SEARCH_DIR,
+    SearchIndexWriter,
+    check_search_dir,
+    index_search_pages
+)
+from sync import (
+    SyncReport,
+    copy_file,
+    load_synced_files,
+    save_synced_files,
+    sync_dir
+)
+from template import load_template
+
+MANIFEST_NAME = "manifest.json"
+STATIC_MANIFEST_NAME = "static.json"
+PAGE_INDEX_NAME = "pages.sqlite"
+SEARCH_STATE_NAME = "search.json"
+# Files of a state directory that describe the published build
+RECORD_NAMES = (MANIFEST_NAME, STATIC_MANIFEST_NAME, PAGE_INDEX_NAME, SEARCH_STATE_NAME)
+
+logger = logging.getLogger(__name__)
+
+
+class SiteConfig:  # Where a site lives and how to build it
+
+    def __init__(
+        self,
+        content_dir="content",
+        static_dir="static",
+        template_path="template.html",
+        target_dir="public",
+        state_dir=".build",
+        incremental=False,
+        staged=False,
+        workers=1,
+        async_io=False,
+        hardlink=False,
+        compress=False,
+        compress_workers=0,
+        cache=False,
+        cache_mb=256,
+        memo_blocks=0,
+        site_url=None,
+        site_title=None,
+        site_author=None,
+        search=False,
+    ):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.target_dir = target_dir
+        self.state_dir = state_dir          # Build records and caches kept between builds
+        self.incremental = incremental
+        self.staged = staged
+        self.workers = workers
+        self.async_io = async_io
+        self.hardlink = hardlink
+        self.compress = compress
+        self.compress_workers = compress_workers  # Compression threads, 0 for one per CPU core
+        self.cache = cache
+        self.cache_mb = cache_mb
+        self.memo_blocks = memo_blocks
+        self.site_url = site_url            # Base URL of the published site; enables sitemap.xml and feed.xml
+        self.site_title = site_title        # Feed title, the title of index.html when None
+        self.site_author = site_author      # Feed author, the feed title when None
+        self.search = search                # Write a full-text search index to <target>/_search
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.state_dir, MANIFEST_NAME)
+
+    @property
+    def static_manifest_path(self):
+        return os.path.join(self.state_dir, STATIC_MANIFEST_NAME)
+
+    @property
+    def page_index_path(self):
+        return os.path.join(self.state_dir, PAGE_INDEX_NAME)
+
+    @property
+    def search_state_path(self):
+        return os.path.join(self.state_dir, SEARCH_STATE_NAME)
+
+    @property
+    def document_cache_dir(self):
+        return os.path.join(self.state_dir, "documents")
+
+    @property
+    def stage_state_dir(self):
+        return os.path.join(self.state_dir, "stage")
+
+
+class BuildResult:  # What one build did
+
+    def __init__(self, collect_terms=False):
+        self.pages = RenderReport(collect_terms)  # Rendered, changed, failed and removed pages
+        self.static = None                  # SyncReport of the static files
+        self.scan = None                    # SiteScan the build worked from
+        self.compressed = 0                 # Compressed variants written
+        self.feeds = []                     # Sitemap and feed files that changed
+        self.search_shards = 0              # Search index shards rewritten
+        self.published = None              # Directory a staged build published
+        self.timings = {}                   # Stage name -> seconds
+        self.seconds = 0.0
+
+    @property
+    def errors(self):
+        return self.pages.failures
+
+    @property
+    def ok(self):
+        return not self.pages.failures
+
+    def __repr__(self):
+        return f"{self.pages} in {self.seconds:.2f}s"
+
+
+class Site:  # A site built repeatedly in one process, keeping caches and compiled templates warm
+
+    def __init__(self, config=None):
+        self.config = config if config is not None else SiteConfig()
+        self.cache = None
+        self.manifest = None                # Dependency graph of the last build, loaded by rebuild()
+        self.dependents = None              # Absolute input path -> sources of the pages using it
+        self.memo = None                    # This site's block memo, only installed while it renders
+        if self.config.cache:
+            self.cache = DocumentCache(self.config.document_cache_dir, int(self.config.cache_mb * 1024 * 1024))
+        if self.config.memo_blocks:
+            self.memo = BlockMemo(self.config.memo_blocks)
+
+    def build(self):
+        # Returns a BuildResult; pages that fail are listed in its errors instead of raising.
+        # A staged build with errors is discarded and the published site stays as it was
+        result = BuildResult(self.config.search)
+        profile = instrument.active_profile()
+        own_profile = profile is None
+        if own_profile:
+            profile = BuildProfile()
+            instrument.activate(profile)
+        # A caller's profile may already hold earlier builds; only this one's share is reported
+        before = {name: stats.seconds for name, stats in profile.stages.items()}
+        start = time.perf_counter()
+        try:
+            with use_block_memo(self.memo):
+                self.run(result)
+        finally:
+            self.manifest = None
+            result.seconds = time.perf_counter() - start
+            result.timings = {
+                name: stats.seconds - before.get(name, 0.0) for name, stats in profile.stages.items()
+            }
+            if own_profile:
+                instrument.deactivate()
+        if self.memo is not None:
+            logger.info(f"Block memo: {self.memo}")
+        if self.cache is not None:
+            removed = self.cache.evict()
+            if removed:
+                logger.info(f"Evicted {removed} document(s) from the cache")
+        return result
+
+    def run(self, result):
+        config = self.config
+        target_dir = config.target_dir
+        state_dir = config.state_dir
+        if config.staged:
+            # The build records only become current if the staged build is published
+            state_dir = config.stage_state_dir
+            os.makedirs(state_dir, exist_ok=True)
+            for name in RECORD_NAMES:
+                current = os.path.join(config.state_dir, name)
+                staged = os.path.join(state_dir, name)
+                if os.path.exists(current):
+                    shutil.copyfile(current, staged)
+                elif os.path.exists(staged):
+                    os.remove(staged)
+            build_dir = prepare_stage(target_dir, link_previous=config.incremental)
+        elif config.incremental:
+            build_dir = target_dir
+            os.makedirs(target_dir, exist_ok=True)
+        else:
+            # We clean up the directory so test can make sense
+            remove_stages(target_dir)
+            if os.path.exists(target_dir):
+                shutil.rmtree(target_dir)
+            os.mkdir(target_dir)
+            logger.info(f"Created folder: {target_dir}")
+            build_dir = target_dir
+        try:
+            self.build_into(build_dir, state_dir, result)
+        except Exception:
+            if config.staged:
+                # The published build stays as it was
+                shutil.rmtree(build_dir)
+            raise
+        if result.errors and config.staged:
+            shutil.rmtree(build_dir)
+            return
+        if config.staged:
+            publish_stage(build_dir, target_dir)
+            result.published = build_dir
+            for name in RECORD_NAMES:
+                staged = os.path.join(state_dir, name)
+                if os.path.exists(staged):
+                    os.replace(staged, os.path.join(config.state_dir, name))
+
+    def build_into(self, build_dir, state_dir, result):
+        config = self.config
+        manifest_path = os.path.join(state_dir, MANIFEST_NAME)
+        static_manifest_path = os.path.join(state_dir, STATIC_MANIFEST_NAME)
+        # Every later stage works from this one walk of the source trees
+        with instrument.stage("scan"):
+            scan = SiteScan(config.content_dir, config.static_dir, build_dir)
+        logger.info(scan)
+        result.scan = scan
+        if config.search:
+            check_search_dir([os.path.relpath(dest, build_dir) for _, dest in scan.page_jobs] + list(scan.static))
+        with instrument.stage("sync_static"):
+            previous = load_synced_files(static_manifest_path)
+            result.static = sync_dir(
+                config.static_dir, build_dir, previous, hardlink=config.hardlink, files=scan.static
+            )
+        save_synced_files(static_manifest_path, result.static.files)
+        logger.info(f"Static files: {result.static}")
+        try:
+            if config.incremental:
+                generate_pages_incremental(
+                    config.content_dir, config.template_path, build_dir, manifest_path, config.workers,
+                    self.cache, config.async_io, scan, result.pages, config.target_dir,
+                )
+            else:
+                generate_pages_parallel(
+                    config.content_dir, config.template_path, build_dir, config.workers,
+                    self.cache, config.async_io, scan.page_jobs, result.pages,
+                )
+        except PageBuildError as error:
+            # Already listed in result.pages; a staged build with errors is not compressed
+            logger.error(str(error))
+            if config.staged:
+                return
+        if config.site_url:
+            with instrument.stage("index"):
+                self.update_index(build_dir, os.path.join(state_dir, PAGE_INDEX_NAME), result, scan.page_jobs)
+        if config.search:
+            with instrument.stage("search_index"):
+                self.update_search(build_dir, os.path.join(state_dir, SEARCH_STATE_NAME), result, scan.page_jobs)
+        if config.compress:
+            with instrument.stage("compress"):
+                written, skipped = precompress_dir(
+                    build_dir, config.compress_workers or os.cpu_count(), result.static.files
+                )
+            result.compressed = written
+            logger.info(f"Compressed {written} file variant(s), {skipped} already up to date")
+
+    def rebuild(self, paths):
+        # Brings the output up to date after the given files changed, appeared or were deleted,
+        # from the dependency graph of the last build instead of a scan of the source trees.
+        # Staged and full builds, a new or removed content template, or a missing or outdated
+        # graph, or one recorded for another output directory, fall back to build()
+        config = self.config
+        if config.staged or not config.incremental:
+            return self.build()
+        if self.manifest is None:
+            self.load_graph()
+        if not self.manifest.is_compatible(config.target_dir):
+            return self.build()
+        content_dir = os.path.abspath(config.content_dir)
+        static_dir = os.path.abspath(config.static_dir)
+        sources = set()
+        gone = []
+        static = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if is_inside(path, content_dir):
+                if os.path.basename(path) == TEMPLATE_NAME:
+                    return self.build()
+                if path.endswith(".md"):
+                    source = os.path.join(config.content_dir, os.path.relpath(path, content_dir))
+                    if os.path.exists(path):
+                        sources.add(source)
+                    else:
+                        gone.append(source)
+            elif is_inside(path, static_dir):
+                static.append(os.path.relpath(path, static_dir))
+            sources.update(source for source in self.dependents.get(path, ()) if os.path.exists(source))
+        if config.search:
+            check_search_dir([page_destination(source, config.content_dir, "") for source in sources] + static)
+        result = BuildResult(config.search)
+        start = time.perf_counter()
+        with instrument.stage("rebuild"), use_block_memo(self.memo):
+            self.rebuild_pages(sorted(sources), gone, result)
+            result.static = self.rebuild_static(static)
+            if config.site_url:
+                self.update_index(config.target_dir, config.page_index_path, result)
+            if config.search:
+                self.update_search(config.target_dir, config.search_state_path, result)
+            if config.compress:
+                self.rebuild_variants(result)
+        result.seconds = time.perf_counter() - start
+        result.timings = {"rebuild": result.seconds}
+        return result
+
+    def watched_paths(self):
+        # The source trees, and every template and partial outside them the last build used
+        if self.manifest is None:
+            self.load_graph()
+        config = self.config
+        content_dir = os.path.abspath(config.content_dir)
+        templates = {os.path.abspath(config.template_path)}
+        templates.update(path for path in self.dependents if not is_inside(path, content_dir))
+        return [config.content_dir, config.static_dir, *sorted(templates)]
+
+    def load_graph(self):
+        self.manifest = BuildManifest.load(self.config.manifest_path)
+        self.dependents = {}
+        for source, entry in self.manifest.pages.items():
+            for path in entry["inputs"]:
+                self.dependents.setdefault(os.path.abspath(path), []).append(source)
+
+    def rebuild_pages(self, sources, gone, result):
+        config = self.config
+        manifest = self.manifest
+        jobs = [(source, page_destination(source, config.content_dir, config.target_dir)) for source in sources]
+        templates = resolve_templates(jobs, config.content_dir, config.template_path)
+        hashes = HashCache(manifest.files)
+        try:
+            render_pages(
+                jobs, config.template_path, config.workers, self.cache, templates, config.async_io, result.pages
+            )
+        except PageBuildError as error:
+            logger.error(str(error))
+        failed = {source for source, _ in result.errors}
+        for source, dest in jobs:
+            self.forget(source)
+            if source in failed:
+                # Left out of the graph so the next build retries it
+                continue
+            inputs = [source, *load_template(templates[source]).dependencies]
+            manifest.pages[source] = {
+                "dest": os.path.relpath(dest, config.target_dir),
+                "inputs": {path: hashes.hash(path) for path in inputs},
+            }
+            for path in inputs:
+                self.dependents.setdefault(os.path.abspath(path), []).append(source)
+        for source in gone:
+            entry = self.forget(source)
+            if entry is not None:
+                dest = os.path.join(config.target_dir, entry["dest"])
+                remove_output(dest, config.target_dir)
+                result.pages.removed.append(dest)
+        manifest.files.update(hashes.used)
+        manifest.save(config.manifest_path)
+
+    def forget(self, source):
+        # Drops a page from the graph and returns its entry, if it had one
+        entry = self.manifest.pages.pop(source, None)
+        if entry is not None:
+            for path in entry["inputs"]:
+                users = self.dependents.get(os.path.abspath(path), [])
+                if source in users:
+                    users.remove(source)
+        return entry
+
+    def rebuild_static(self, relative_paths):
+        config = self.config
+        synced = set(load_synced_files(config.static_manifest_path))
+        report = SyncReport()
+        for relative_path in relative_paths:
+            source = os.path.join(config.static_dir, relative_path)
+            dest = os.path.join(config.target_dir, relative_path)
+            if os.path.isfile(source):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                copy_file(source, dest, config.hardlink)
+                report.copied.append(dest)
+                synced.add(relative_path)
+            elif relative_path in synced:
+                remove_output(dest, config.target_dir)
+                report.removed.append(dest)
+                synced.discard(relative_path)
+        report.files = sorted(synced)
+        if relative_paths:
+            save_synced_files(config.static_manifest_path, report.files)
+        return report
+
+    def rebuild_variants(self, result):
+        # Brings the compressed variants of the outputs this rebuild wrote or removed up to date
+        config = self.config
+        removed = result.pages.removed + result.static.removed
+        written = result.pages.changed + result.static.copied + result.feeds
+        if result.search_shards:
+            written.append(os.path.join(config.target_dir, SEARCH_DIR, DOCS_NAME))
+        result.compressed, _ = update_variants(
+            written + removed, config.target_dir, config.compress_workers or os.cpu_count(), result.static.files
+        )
+        for dest in removed:
+            # Prunes the directories that only the variants kept
+            remove_output(dest, config.target_dir)
+
+    def update_index(self, build_dir, path, result, jobs=None):
+        # Brings the page index up to date with the pages this build changed or removed, and
+        # regenerates sitemap.xml and feed.xml from it when it changed. jobs, when given, are
+        # all the pages of the site: pages the index does not know yet are added, and pages
+        # that are gone are dropped
+        failed = {source for source, _ in result.errors}
+        with PageIndex(path) as index:
+            known = index.paths()
+            changed = set(result.pages.changed)
+            pages = jobs if jobs is not None else result.pages.rendered
+            index_pages(index, [
+                (source, dest) for source, dest in pages
+                if source not in failed and os.path.exists(dest)
+                and (dest in changed or index_path(dest, build_dir) not in known)
+            ], build_dir)
+            if jobs is not None:
+                index.remove(known - {index_path(dest, build_dir) for _, dest in jobs})
+            else:
+                index.remove(index_path(dest, build_dir) for dest in result.pages.removed)
+            sitemap = os.path.join(build_dir, SITEMAP_NAME)
+            if index.changed or not os.path.exists(sitemap):
+                result.feeds = write_feeds(
+                    index, build_dir, self.config.site_url, self.config.site_title, self.config.site_author
+                )
+
+    def update_search(self, build_dir, path, result, jobs=None):
+        # Reindexes the text of the pages this build changed and drops removed ones,
+        # rewriting only the search shards of the terms that moved. Rendered pages bring
+        # their terms along; only pages new to the index but not rendered are read again.
+        # jobs as for update_index
+        failed = {source for source, _ in result.errors}
+        writer = SearchIndexWriter(build_dir, path, self.config.target_dir)
+        changed = set(result.pages.changed)
+        pages = jobs if jobs is not None else result.pages.rendered
+        index_search_pages(writer, [
+            (source, dest) for source, dest in pages
+            if source not in failed and os.path.exists(dest)
+            and (dest in changed or index_path(dest, build_dir) not in writer.ids)
+        ], build_dir, result.pages.terms)
+        if jobs is not None:
+            for page in set(writer.ids) - {index_path(dest, build_dir) for _, dest in jobs}:
+                writer.remove(page)
+        else:
+            for dest in result.pages.removed:
+                writer.remove(index_path(dest, build_dir))
+        result.search_shards = writer.save()
+
+    def render_page(self, markdown):
+        # The page this site would write for markdown, without touching the disk
+        with use_block_memo(self.memo):
+            return render_document(markdown, self.config.template_path, self.cache)
+
+
+def is_inside(path, directory):
+    return path.startswith(directory + os.sep)
+
+
+def build(config=None):
+    return Site(config).build()
+
+
+def render_markdown(markdown):
+    # The content HTML of a markdown string. Patterns are compiled once per process;
+    # the block memo is the one enable_block_memo installed, if any, never a Site's
+    return markdown_to_html_node(markdown).to_html()
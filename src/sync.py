@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from build import remove_output
+from scan import scan_tree
+
+
+class SyncReport:  # What a sync_dir run did
+
+    def __init__(self, copied=None, skipped=0, removed=None, files=None):
+        self.copied = copied if copied is not None else []         # Destination paths written
+        self.skipped = skipped                                     # Files already up to date
+        self.removed = removed if removed is not None else []      # Stale destination paths deleted
+        self.files = files if files is not None else []            # Relative paths now synced
+
+    def __repr__(self):
+        return f"Copied {len(self.copied)} file(s), skipped {self.skipped}, removed {len(self.removed)}"
+
+
+def is_up_to_date(source_stat, dest_path):
+    # Copies keep the source mtime, so equal size and mtime means nothing changed
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    return dest_stat.st_size == source_stat.st_size and dest_stat.st_mtime_ns == source_stat.st_mtime_ns
+
+
+def copy_file(source_path, dest_path, hardlink=False):
+    if hardlink:
+        try:
+            tmp_path = dest_path + ".tmp"
+            os.link(source_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+            return
+        except OSError:
+            pass                # Other filesystem or no link support: fall back to a copy
+    # copy2 uses sendfile/copy_file_range when the platform has them and keeps the mtime
+    tmp_path = dest_path + ".tmp"
+    shutil.copy2(source_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+
+
+def sync_dir(source_dir, target_dir, previous=(), workers=8, hardlink=False, files=None):
+    # Mirrors source_dir into target_dir, copying only new or changed files.
+    # target_dir also holds generated pages, so only files listed in previous (the
+    # relative paths synced last time) are treated as stale when their source is gone.
+    # files is the scan_tree result of source_dir, when the caller already has it
+    if not os.path.exists(source_dir):
+        raise Exception('Directory does not exist')
+    if files is None:
+        files = scan_tree(source_dir)
+    report = SyncReport()
+    jobs = []
+    for relative_path in sorted(files):
+        dest_path = os.path.join(target_dir, relative_path)
+        if is_up_to_date(files[relative_path], dest_path):
+            report.skipped += 1
+        else:
+            jobs.append((os.path.join(source_dir, relative_path), dest_path))
+    for dest_dir in sorted({os.path.dirname(dest_path) for _, dest_path in jobs}):
+        os.makedirs(dest_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda job: copy_file(*job, hardlink), jobs))
+    report.copied = [dest_path for _, dest_path in jobs]
+    for relative_path in sorted(set(previous) - set(files)):
+        dest_path = os.path.join(target_dir, relative_path)
+        remove_output(dest_path, target_dir)
+        report.removed.append(dest_path)
+    report.files = sorted(files)
+    return report
+
+
+def load_synced_files(path):
+    # Relative paths synced by the previous build, empty if it left no record
+    try:
+        with open(path, 'r') as synced_file:
+            return json.load(synced_file)
+    except (OSError, ValueError):
+        return []
+
+
+def save_synced_files(path, files):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as synced_file:
+        json.dump(files, synced_file, indent=1)
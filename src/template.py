@@ -0,0 +1,97 @@
+import os
+import re
+
+SLOT_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+INCLUDE_PATTERN = re.compile(r'\{\{>\s*([^\s}]+)\s*\}\}')
+
+
+def expand_includes(path, dependencies, including=()):
+    # Returns the text of path with every {{> partial.html }} replaced by that file, resolved
+    # relative to the file that includes it. Every file read is appended to dependencies
+    if path in including:
+        raise ValueError(f"Template include cycle: {' -> '.join(including + (path,))}")
+    with open(path, 'r') as template_file:
+        text = template_file.read()
+    if path not in dependencies:
+        dependencies.append(path)
+    base_dir = os.path.dirname(path)
+
+    def include(match):
+        partial_path = os.path.normpath(os.path.join(base_dir, match.group(1)))
+        return expand_includes(partial_path, dependencies, including + (path,))
+
+    return INCLUDE_PATTERN.sub(include, text)
+
+
+class Template:  # A page template split into static text segments and {{ Name }} slots
+
+    def __init__(self, text):
+        self.segments = []      # Static text; slot i sits between segments[i] and segments[i + 1]
+        self.slots = []         # (name, original placeholder text) for every slot
+        position = 0
+        for match in SLOT_PATTERN.finditer(text):
+            self.segments.append(text[position:match.start()])
+            self.slots.append((match.group(1), match.group(0)))
+            position = match.end()
+        self.segments.append(text[position:])
+        self.dependencies = []  # Template file and partials it was read from, for the build graph
+
+    @classmethod
+    def from_file(cls, path):
+        dependencies = []
+        template = cls(expand_includes(path, dependencies))
+        template.dependencies = dependencies
+        return template
+
+    def __eq__(self, template):
+        return self.segments == template.segments and self.slots == template.slots
+
+    def __repr__(self):
+        return f"Template(slots={[name for name, _ in self.slots]})"
+
+    def render(self, fields):
+        # Slots without a value keep their placeholder, as the old str.replace did
+        parts = [self.segments[0]]
+        for (name, placeholder), segment in zip(self.slots, self.segments[1:]):
+            parts.append(fields.get(name, placeholder))
+            parts.append(segment)
+        return "".join(parts)
+
+    def write(self, stream, fields):
+        # Like render, but writes straight to stream; a value with write_html (an HTMLNode)
+        # is serialized into the stream without building its string first
+        stream.write(self.segments[0])
+        for (name, placeholder), segment in zip(self.slots, self.segments[1:]):
+            value = fields.get(name, placeholder)
+            if hasattr(value, "write_html"):
+                value.write_html(stream)
+            else:
+                stream.write(value)
+            stream.write(segment)
+
+
+_compiled_templates = {}
+
+
+def file_versions(paths):
+    versions = []
+    for path in paths:
+        stat = os.stat(path)
+        versions.append((stat.st_mtime_ns, stat.st_size))
+    return versions
+
+
+def load_template(path):
+    # Compiles each template file once; it is compiled again only if it or one of its partials
+    # changes on disk
+    key = os.path.abspath(path)
+    cached = _compiled_templates.get(key)
+    if cached is not None:
+        try:
+            if file_versions(cached[1].dependencies) == cached[0]:
+                return cached[1]
+        except OSError:
+            pass
+    template = Template.from_file(path)
+    _compiled_templates[key] = (file_versions(template.dependencies), template)
+    return template
@@ -0,0 +1,278 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mdblock
+from build import (
+    PageBuildError,
+    RenderReport,
+    collect_page_jobs,
+    explain,
+    generate_pages_incremental,
+    generate_pages_parallel,
+    render_pages
+)
+from doccache import DocumentCache
+from mdblock import (
+    BlockMemo,
+    disable_block_memo,
+    enable_block_memo,
+    use_block_memo
+)
+from search import page_terms
+
+
+class TestIncrementalBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest = os.path.join(self.root, ".build", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.public)
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nSome *text*")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def read(self, path):
+        with open(path, 'r') as file:
+            return file.read()
+
+    def build(self):
+        return generate_pages_incremental(self.content, self.template, self.public, self.manifest)
+
+    def test_collect_page_jobs(self):
+        jobs = collect_page_jobs(self.content, self.public)
+        self.assertEqual(
+            jobs,
+            [
+                (os.path.join(self.content, "blog", "post.md"), os.path.join(self.public, "blog", "post.html")),
+                (os.path.join(self.content, "index.md"), os.path.join(self.public, "index.html")),
+            ],
+        )
+
+    def test_only_changed_pages_are_rendered(self):
+        self.assertEqual(self.build(), 2)
+        self.assertEqual(self.build(), 0)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome back")
+        self.assertEqual(self.build(), 1)
+        self.assertEqual(
+            self.read(os.path.join(self.public, "index.html")),
+            "<title>Home</title><div><h1>Home</h1><p>Welcome back</p></div>",
+        )
+
+    def test_template_change_renders_everything(self):
+        self.build()
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(self.build(), 2)
+
+    def test_missing_output_is_rendered_again(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        self.assertEqual(self.build(), 1)
+
+    def test_removed_source_deletes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.assertEqual(self.build(), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        self.template = os.path.join(self.root, "template.html")
+        self.blog_template = os.path.join(self.content, "blog", "template.html")
+        self.footer = os.path.join(self.root, "footer.html")
+        self.manifest = os.path.join(self.root, ".build", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(self.blog_template, "<h1>{{ Title }}</h1>{{ Content }}{{> ../../footer.html }}")
+        self.write(self.footer, "<footer></footer>")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "a.md"), "# A")
+        self.write(os.path.join(self.content, "blog", "b.md"), "# B")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def build(self):
+        return generate_pages_incremental(self.content, self.template, self.public, self.manifest)
+
+    def explain(self, target):
+        return explain(target, self.content, self.template, self.public, self.manifest)
+
+    def test_directory_template(self):
+        self.build()
+        with open(os.path.join(self.public, "blog", "a.html"), 'r') as file:
+            self.assertEqual(file.read(), "<h1>A</h1><div><h1>A</h1></div><footer></footer>")
+
+    def test_only_dependents_are_rendered(self):
+        self.assertEqual(self.build(), 3)
+        self.write(self.footer, "<footer>new</footer>")
+        self.assertEqual(self.build(), 2)
+        self.write(self.template, "<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(self.build(), 1)
+        os.remove(self.blog_template)
+        self.assertEqual(self.build(), 2)
+
+    def test_explain(self):
+        self.build()
+        self.write(self.footer, "<footer>new</footer>")
+        self.assertEqual(
+            self.explain(os.path.join(self.public, "blog", "a.html")),
+            [
+                f"{os.path.join(self.public, 'blog', 'a.html')} is built from:",
+                f"  {os.path.join(self.content, 'blog', 'a.md')} (unchanged)",
+                f"  {self.blog_template} (unchanged)",
+                f"  {self.footer} (changed)",
+                "It will be rendered again: 1 input(s) changed",
+            ],
+        )
+        self.assertEqual(self.explain(self.footer)[0], f"2 page(s) depend on {self.footer}:")
+        self.assertEqual(self.explain(os.path.join(self.content, "index.md"))[-1], "It is up to date")
+
+
+class TestParallelBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, 'w') as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        for i in range(12):
+            page_dir = os.path.join(self.content, f"section{i % 3}")
+            os.makedirs(page_dir, exist_ok=True)
+            with open(os.path.join(page_dir, f"page{i}.md"), 'w') as file:
+                file.write(f"# Page {i}\n\nThis is **page** number `{i}`\n\n* one\n* two")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def read_tree(self, root):
+        pages = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, 'r') as file:
+                    pages[os.path.relpath(path, root)] = file.read()
+        return pages
+
+    def test_parallel_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        self.assertEqual(generate_pages_parallel(self.content, self.template, serial, workers=1), 12)
+        self.assertEqual(generate_pages_parallel(self.content, self.template, parallel, workers=4), 12)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_unchanged_pages_are_not_rewritten(self):
+        target = os.path.join(self.root, "public")
+        generate_pages_parallel(self.content, self.template, target, workers=1)
+        for async_io in (False, True):
+            with self.subTest(async_io=async_io):
+                for source, dest in collect_page_jobs(self.content, target):
+                    os.utime(dest, ns=(0, 0))
+                with open(os.path.join(self.content, "section0", "page0.md"), 'a') as file:
+                    file.write(f"\n\n{async_io}")
+                with self.assertLogs("build", level="INFO") as logs:
+                    generate_pages_parallel(self.content, self.template, target, workers=1, async_io=async_io)
+                self.assertIn("Changed 1 of 12 rendered page(s)", logs.output[-1])
+                mtimes = [os.stat(dest).st_mtime_ns for _, dest in collect_page_jobs(self.content, target)]
+                self.assertEqual(mtimes.count(0), 11)
+
+    def test_async_io_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        generate_pages_parallel(self.content, self.template, serial, workers=1)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                target = os.path.join(self.root, f"async{workers}")
+                self.assertEqual(generate_pages_parallel(self.content, self.template, target, workers, async_io=True), 12)
+                self.assertEqual(self.read_tree(serial), self.read_tree(target))
+
+    def test_async_io_reports_errors_per_file(self):
+        target = os.path.join(self.root, "public")
+        missing = os.path.join(self.content, "missing.md")
+        jobs = [(missing, os.path.join(target, "missing.html"))] + collect_page_jobs(self.content, target)
+        with self.assertRaises(PageBuildError) as context:
+            render_pages(jobs, self.template, async_io=True)
+        self.assertEqual([source for source, _ in context.exception.failures], [missing])
+        self.assertEqual(len(self.read_tree(target)), 12)
+
+    def test_block_memo_is_shared_by_workers(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        generate_pages_parallel(self.content, self.template, serial, workers=1)
+        memo = enable_block_memo()
+        try:
+            generate_pages_parallel(self.content, self.template, parallel, workers=2)
+        finally:
+            disable_block_memo()
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+        self.assertEqual(memo.hits + memo.misses, 36)
+        self.assertGreaterEqual(memo.hits, 10)   # The list block, rendered once per worker
+
+    def test_terms_are_collected_while_rendering(self):
+        target = os.path.join(self.root, "public")
+        jobs = collect_page_jobs(self.content, target)
+        expected = {source: page_terms(source) for source, _ in jobs}
+        cache = DocumentCache(os.path.join(self.root, "cache"))
+        shared_memo = BlockMemo(64)
+        # Cache and memo entries without the block texts
+        render_pages(jobs, self.template, cache=cache)
+        with use_block_memo(shared_memo):
+            render_pages(jobs, self.template)
+        # Twice with the memo and the cache, so that they are hit the second time
+        for options in (
+            {}, {"workers": 2}, {"async_io": True}, {"workers": 2, "async_io": True}, {"cache": cache},
+            {"cache": cache},
+        ):
+            for memo in (None, shared_memo, shared_memo):
+                with self.subTest(options=options, memo=memo is not None), use_block_memo(memo):
+                    report = RenderReport(collect_terms=True)
+                    render_pages(jobs, self.template, report=report, **options)
+                    self.assertEqual(report.terms, expected)
+        mdblock.STREAM_MIN_BYTES = 0
+        try:
+            report = RenderReport(collect_terms=True)
+            render_pages(jobs, self.template, report=report)
+            self.assertEqual(report.terms, expected)
+        finally:
+            mdblock.STREAM_MIN_BYTES = 4 * 1024 * 1024
+        self.assertIsNone(RenderReport().terms)
+
+    def test_errors_are_reported_per_file(self):
+        target = os.path.join(self.root, "public")
+        missing = os.path.join(self.content, "missing.md")
+        broken = os.path.join(self.content, "broken.md")
+        jobs = [
+            (missing, os.path.join(target, "missing.html")),
+            (os.path.join(self.content, "section0", "page0.md"), os.path.join(target, "page0.html")),
+            (broken, os.path.join(target, "broken.html")),
+        ]
+        with self.assertRaises(PageBuildError) as context:
+            render_pages(jobs, self.template, workers=2)
+        self.assertEqual([source for source, _ in context.exception.failures], [missing, broken])
+        self.assertTrue(os.path.exists(os.path.join(target, "page0.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from compress import (
+    available_encodings,
+    precompress_dir
+)
+
+
+class TestPrecompress(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "images"))
+        self.page = self.write("index.html", "<p>Hello</p>" * 100)
+        self.css = self.write("index.css", "body { color: red; }\n" * 50)
+        self.write("small.html", "<p>Hi</p>")
+        self.write(os.path.join("images", "logo.png"), "not really a png" * 100)
+        self.variants = len(available_encodings())
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        with open(path, 'w') as file:
+            file.write(text)
+        return path
+
+    def test_writes_text_variants(self):
+        self.assertEqual(precompress_dir(self.root), (2 * self.variants, 0))
+        with gzip.open(self.page + ".gz", 'rt') as file:
+            self.assertEqual(file.read(), "<p>Hello</p>" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "small.html.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "images", "logo.png.gz")))
+
+    def test_only_changed_files(self):
+        precompress_dir(self.root)
+        self.assertEqual(precompress_dir(self.root), (0, 2 * self.variants))
+        self.write("index.css", "body { color: blue; }\n" * 50)
+        os.utime(self.css, ns=(0, os.stat(self.css).st_mtime_ns + 1))
+        self.assertEqual(precompress_dir(self.root), (self.variants, self.variants))
+
+    def test_deterministic(self):
+        precompress_dir(self.root)
+        with open(self.page + ".gz", 'rb') as file:
+            first = file.read()
+        os.remove(self.page + ".gz")
+        precompress_dir(self.root)
+        with open(self.page + ".gz", 'rb') as file:
+            self.assertEqual(file.read(), first)
+
+    def test_removes_orphaned_variants(self):
+        precompress_dir(self.root)
+        os.remove(self.page)
+        archive = self.write("archive.tar.gz", "binary")
+        precompress_dir(self.root)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+        self.assertTrue(os.path.exists(archive))
+
+    def test_removes_variants_of_files_that_shrank(self):
+        precompress_dir(self.root)
+        self.write("index.html", "<p>Hi</p>")
+        precompress_dir(self.root)
+        self.assertEqual(
+            [name for name in os.listdir(self.root) if name.startswith("index.html")],
+            ["index.html"],
+        )
+
+    def test_keeps_shipped_variants(self):
+        export = self.write("export.json.gz", "shipped")
+        self.write("index.css.gz", "shipped")
+        keep = ["export.json.gz", "index.css.gz"]
+        self.assertEqual(precompress_dir(self.root, keep=keep), (2 * self.variants - 1, 0))
+        self.assertEqual(precompress_dir(self.root, keep=keep), (0, 2 * self.variants - 1))
+        with open(export, 'r') as file:
+            self.assertEqual(file.read(), "shipped")
+        with open(self.css + ".gz", 'r') as file:
+            self.assertEqual(file.read(), "shipped")
+
+
+if __name__ == "__main__":
+    unittest.main()
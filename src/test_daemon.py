@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from client import send_request
+from daemon import BuildDaemon
+from sitebuild import (
+    Site,
+    SiteConfig
+)
+
+
+class TestBuildDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        os.makedirs(self.content)
+        os.makedirs(os.path.join(self.root, "static"))
+        self.write(os.path.join(self.root, "template.html"), "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+        config = SiteConfig(
+            content_dir=self.content,
+            static_dir=os.path.join(self.root, "static"),
+            template_path=os.path.join(self.root, "template.html"),
+            target_dir=self.public,
+            state_dir=os.path.join(self.root, ".build"),
+            incremental=True,
+        )
+        self.socket_path = os.path.join(self.root, "daemon.sock")
+        self.daemon = BuildDaemon(Site(config), self.socket_path)
+        self.daemon.listen()
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        send_request({"command": "stop"}, self.socket_path)
+        self.thread.join()
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def test_requests(self):
+        self.assertEqual(send_request({"command": "ping"}, self.socket_path)["summary"], "pong")
+        self.assertEqual(send_request({"command": "build"}, self.socket_path)["rendered"], [])
+        index = os.path.join(self.content, "index.md")
+        self.write(index, "# Home\n\nEdited")
+        response = send_request({"command": "rebuild", "paths": [index]}, self.socket_path)
+        self.assertTrue(response["ok"])
+        self.assertEqual(response["changed"], [os.path.join(self.public, "index.html")])
+        self.assertIn("error", send_request({"command": "publish"}, self.socket_path))
+
+    def test_second_daemon_is_refused(self):
+        with self.assertRaises(Exception):
+            BuildDaemon(self.daemon.site, self.socket_path).listen()
+
+
+if __name__ == "__main__":
+    unittest.main()
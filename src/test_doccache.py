@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import instrument
+from build import render_pages
+from doccache import DocumentCache
+from instrument import BuildProfile
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = DocumentCache(os.path.join(self.root, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_put_and_get(self):
+        key = self.cache.key("# Title")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "Title", "<div><h1>Title</h1></div>")
+        self.assertEqual(self.cache.get(key), ("Title", "<div><h1>Title</h1></div>", None))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.cache.put(key, "Title", "<div><h1>Title</h1></div>", ["Title"])
+        self.assertEqual(self.cache.get(key), ("Title", "<div><h1>Title</h1></div>", ["Title"]))
+
+    def test_key_depends_on_content(self):
+        self.assertEqual(self.cache.key("a"), self.cache.key("a"))
+        self.assertNotEqual(self.cache.key("a"), self.cache.key("b"))
+
+    def test_evict_least_recently_used(self):
+        keys = [self.cache.key(str(i)) for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, "", "x" * 100)
+            os.utime(self.cache.path(key), ns=(0, i * 10**9))
+        entry_size = os.path.getsize(self.cache.path(keys[0]))
+        self.cache.get(keys[0])             # Now the most recently used
+        self.cache.max_bytes = 2 * entry_size
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+    def test_clear(self):
+        key = self.cache.key("a")
+        self.cache.put(key, "", "")
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.evict(), 0)
+
+
+class TestCachedRendering(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.template = os.path.join(self.root, "template.html")
+        self.source = os.path.join(self.root, "index.md")
+        self.dest = os.path.join(self.root, "public", "index.html")
+        self.cache = DocumentCache(os.path.join(self.root, "cache"))
+        with open(self.template, 'w') as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        with open(self.source, 'w') as file:
+            file.write("# Home\n\nSome *text*")
+
+    def tearDown(self):
+        instrument.deactivate()
+        shutil.rmtree(self.root)
+
+    def read(self):
+        with open(self.dest, 'r') as file:
+            return file.read()
+
+    def test_template_change_reuses_parsed_content(self):
+        render_pages([(self.source, self.dest)], self.template, cache=self.cache)
+        with open(self.template, 'w') as file:
+            file.write("<h1>{{ Title }}</h1>{{ Content }}<footer></footer>")
+        profile = BuildProfile()
+        instrument.activate(profile)
+        render_pages([(self.source, self.dest)], self.template, cache=self.cache)
+        self.assertNotIn("parse_inline", profile.stages)
+        self.assertEqual(self.read(), "<h1>Home</h1><div><h1>Home</h1><p>Some <i>text</i></p></div><footer></footer>")
+
+    def test_cached_output_matches_uncached(self):
+        render_pages([(self.source, self.dest)], self.template)
+        uncached = self.read()
+        render_pages([(self.source, self.dest)], self.template, cache=self.cache)
+        render_pages([(self.source, self.dest)], self.template, cache=self.cache)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.read(), uncached)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode
@@ -99,5 +100,38 @@ class TestParentNode(unittest.TestCase):
         self.assertEqual(f"{node.to_html()}", html)
 
 
+    def test_write_html(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode(None, "Text "), LeafNode("a", "link", {"href": "https://boot.dev"})]),
+                LeafNode("b", "Bold"),
+            ],
+        )
+        stream = io.StringIO()
+        node.write_html(stream)
+        self.assertEqual(stream.getvalue(), node.to_html())
+        self.assertEqual(stream.getvalue(), '<div><p>Text <a href="https://boot.dev">link</a></p><b>Bold</b></div>')
+
+    def test_write_html_deep_tree(self):
+        node = LeafNode(None, "leaf")
+        for _ in range(200):
+            node = ParentNode("span", [node, LeafNode("i", "x")])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span>" * 200 + "leaf<i>x</i></span>"))
+        self.assertEqual(len(html), 200 * len("<span></span><i>x</i>") + len("leaf"))
+
+    def test_write_html_without_children(self):
+        with self.assertRaises(ValueError):
+            ParentNode("div", None).write_html(io.StringIO())
+
+    def test_compact_nodes(self):
+        leaf = LeafNode("b", "Bold")
+        parent = ParentNode("p", [leaf])
+        self.assertFalse(hasattr(leaf, "__dict__"))
+        self.assertFalse(hasattr(parent, "__dict__"))
+        self.assertIs(leaf.props, parent.props)
+        self.assertIs(ParentNode("h" + str(1), [leaf]).tag, ParentNode("h1", [leaf]).tag)
+
 if __name__ == "__main__":
     unittest.main()
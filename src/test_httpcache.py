@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import unittest
+from email.utils import formatdate
+
+from compress import precompress_dir
+from httpcache import (
+    CachePolicy,
+    FileCache,
+    choose_variant,
+    parse_accept_encoding
+)
+
+
+class TestCachePolicy(unittest.TestCase):
+
+    def test_header_for(self):
+        policy = CachePolicy()
+        self.assertEqual(policy.header_for("public/index.html"), "no-cache")
+        self.assertEqual(policy.header_for("public/images/LOGO.PNG"), "public, max-age=86400")
+        self.assertEqual(policy.header_for("public/data.bin"), "no-cache")
+
+    def test_add_rule(self):
+        policy = CachePolicy()
+        policy.add_rule(".css=public, max-age=600")
+        self.assertEqual(policy.header_for("index.css"), "public, max-age=600")
+        with self.assertRaises(ValueError):
+            policy.add_rule("css")
+
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def test_hit_and_change(self):
+        cache = FileCache(max_bytes=1024)
+        path = self.write("a.html", b"<p>a</p>")
+        first = cache.get(path)
+        self.assertEqual(first.body, b"<p>a</p>")
+        self.assertIs(cache.get(path), first)
+        self.write("a.html", b"<p>changed</p>")
+        second = cache.get(path)
+        self.assertEqual(second.body, b"<p>changed</p>")
+        self.assertNotEqual(first.etag, second.etag)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_same_content_same_etag(self):
+        cache = FileCache()
+        first = cache.get(self.write("a.css", b"body {}"))
+        second = cache.get(self.write("b.css", b"body {}"))
+        self.assertEqual(first.etag, second.etag)
+
+    def test_bounded_by_bytes(self):
+        cache = FileCache(max_bytes=100, max_file_bytes=100)
+        paths = [self.write(f"{i}.txt", bytes(40)) for i in range(3)]
+        for path in paths:
+            cache.get(path)
+        self.assertEqual(list(cache.entries), paths[1:])
+        self.assertEqual(cache.bytes, 80)
+
+    def test_large_files_are_not_kept(self):
+        cache = FileCache(max_bytes=100, max_file_bytes=10)
+        entry = cache.get(self.write("big.png", bytes(50)))
+        self.assertIsNone(entry.body)
+        self.assertEqual(entry.size, 50)
+        self.assertEqual(cache.bytes, 0)
+
+    def test_not_modified(self):
+        entry = FileCache().get(self.write("a.html", b"a"))
+        self.assertTrue(entry.is_not_modified({"If-None-Match": entry.etag}))
+        self.assertTrue(entry.is_not_modified({"If-None-Match": '"other", ' + entry.etag}))
+        self.assertFalse(entry.is_not_modified({"If-None-Match": '"other"'}))
+        self.assertTrue(entry.is_not_modified({"If-Modified-Since": entry.last_modified}))
+        self.assertFalse(entry.is_not_modified({"If-Modified-Since": formatdate(entry.mtime - 10, usegmt=True)}))
+        self.assertFalse(entry.is_not_modified({"If-Modified-Since": "not a date"}))
+        self.assertFalse(entry.is_not_modified({}))
+
+
+class TestContentNegotiation(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.page = os.path.join(self.root, "index.html")
+        with open(self.page, 'w') as file:
+            file.write("<p>Hello</p>" * 100)
+        precompress_dir(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip, br;q=0.5, *;q=0, deflate;q=x"),
+            {"gzip": 1.0, "br": 0.5, "*": 0.0, "deflate": 0.0},
+        )
+
+    def test_gzip_variant(self):
+        self.assertEqual(choose_variant(self.page, "gzip, deflate"), (self.page + ".gz", "gzip"))
+        self.assertIn(choose_variant(self.page, "*")[1], ("br", "gzip"))
+
+    def test_identity(self):
+        self.assertEqual(choose_variant(self.page, None), (self.page, None))
+        self.assertEqual(choose_variant(self.page, "gzip;q=0"), (self.page, None))
+        self.assertEqual(choose_variant(self.page, "deflate"), (self.page, None))
+
+    def test_stale_variant_is_ignored(self):
+        with open(self.page, 'a') as file:
+            file.write("<p>Edited</p>")
+        os.utime(self.page, ns=(0, os.stat(self.page).st_mtime_ns + 1))
+        self.assertEqual(choose_variant(self.page, "gzip"), (self.page, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import instrument
+from build import render_pages
+from instrument import BuildProfile
+
+
+class TestBuildProfile(unittest.TestCase):
+
+    def test_stage_and_page(self):
+        profile = BuildProfile()
+        with profile.page("a.md"):
+            with profile.stage("read", nbytes=10):
+                pass
+            with profile.stage("read", nbytes=5):
+                pass
+        with profile.stage("sync_static"):
+            pass
+        self.assertEqual(profile.stages["read"].count, 2)
+        self.assertEqual(profile.stages["read"].bytes, 15)
+        self.assertEqual(list(profile.pages), ["a.md"])
+        self.assertIsNone(profile.events)
+
+    def test_merge(self):
+        first = BuildProfile(trace=True)
+        second = BuildProfile(trace=True)
+        with first.page("a.md"), first.stage("read", nbytes=1):
+            pass
+        with second.page("b.md"), second.stage("read", nbytes=2):
+            pass
+        first.merge(second.to_records())
+        self.assertEqual(first.stages["read"].count, 2)
+        self.assertEqual(first.stages["read"].bytes, 3)
+        self.assertEqual(sorted(first.pages), ["a.md", "b.md"])
+        self.assertEqual(len(first.events), 2)
+
+    def test_report_lists_slowest_pages(self):
+        profile = BuildProfile()
+        profile.current_page = "slow.md"
+        profile.record("parse_inline", 0.0, 2.0)
+        profile.current_page = "fast.md"
+        profile.record("parse_inline", 0.0, 1.0)
+        report = profile.report(top=1)
+        self.assertIn("Slowest 1 of 2 pages", report)
+        self.assertIn("slow.md", report)
+        self.assertNotIn("fast.md", report)
+
+    def test_inactive_stage_is_a_no_op(self):
+        instrument.deactivate()
+        with instrument.stage("read"), instrument.page("a.md"):
+            pass
+        self.assertIsNone(instrument.active_profile())
+
+
+class TestBuildInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, 'w') as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        self.jobs = []
+        for i in range(4):
+            source = os.path.join(self.root, f"page{i}.md")
+            with open(source, 'w') as file:
+                file.write(f"# Page {i}\n\nSome **text**")
+            self.jobs.append((source, os.path.join(self.root, "public", f"page{i}.html")))
+
+    def tearDown(self):
+        instrument.deactivate()
+        shutil.rmtree(self.root)
+
+    def check_profile(self, workers):
+        profile = BuildProfile(trace=True)
+        instrument.activate(profile)
+        render_pages(self.jobs, self.template, workers)
+        instrument.deactivate()
+        for stage in ("read", "extract_title", "split_blocks", "parse_inline", "build_nodes", "serialize", "write"):
+            self.assertEqual(profile.stages[stage].count, 4, stage)
+        self.assertEqual(sorted(profile.pages), sorted(source for source, _ in self.jobs))
+        self.assertEqual(profile.stages["write"].bytes, sum(os.path.getsize(dest) for _, dest in self.jobs))
+        trace_path = os.path.join(self.root, "trace.json")
+        profile.write_chrome_trace(trace_path)
+        with open(trace_path, 'r') as file:
+            self.assertEqual(len(json.load(file)["traceEvents"]), 28)
+
+    def test_serial(self):
+        self.check_profile(workers=1)
+
+    def test_parallel(self):
+        self.check_profile(workers=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
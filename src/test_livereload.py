@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from livereload import (
+    LIVERELOAD_SCRIPT,
+    DirectoryWatcher,
+    ReloadBroadcaster,
+    inject_livereload
+)
+from sitebuild import (
+    Site,
+    SiteConfig
+)
+
+
+class TestInjectLivereload(unittest.TestCase):
+
+    def test_before_body_end(self):
+        html = inject_livereload("<body><p>Hi</p></body></html>")
+        self.assertEqual(html, "<body><p>Hi</p>" + LIVERELOAD_SCRIPT + "</body></html>")
+
+    def test_without_body(self):
+        self.assertEqual(inject_livereload("<p>Hi</p>"), "<p>Hi</p>" + LIVERELOAD_SCRIPT)
+
+
+class TestWatchAndRebuild(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.public = os.path.join(self.root, "public")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+        self.write(os.path.join(self.static, "images", "logo.svg"), "<svg></svg>")
+        self.site = Site(SiteConfig(
+            content_dir=self.content,
+            static_dir=self.static,
+            template_path=self.template,
+            target_dir=self.public,
+            state_dir=os.path.join(self.root, ".build"),
+            incremental=True,
+        ))
+        self.site.build()
+        self.watcher = DirectoryWatcher(self.site.watched_paths())
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def read(self, path):
+        with open(path, 'r') as file:
+            return file.read()
+
+    def rebuild(self):
+        changed, removed = self.watcher.poll()
+        result = self.site.rebuild(changed + removed)
+        self.watcher.paths = self.site.watched_paths()
+        return result
+
+    def test_poll_reports_changes(self):
+        self.assertEqual(self.watcher.poll(), ([], []))
+        post = os.path.join(self.content, "blog", "post.md")
+        new_page = os.path.join(self.content, "new.md")
+        self.write(post, "# Edited post")
+        self.write(new_page, "# New")
+        os.remove(os.path.join(self.static, "images", "logo.svg"))
+        changed, removed = self.watcher.poll()
+        self.assertEqual(changed, sorted([post, new_page]))
+        self.assertEqual(removed, [os.path.join(self.static, "images", "logo.svg")])
+        self.assertEqual(self.watcher.poll(), ([], []))
+
+    def test_rebuild_only_changed_page(self):
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Edited post")
+        result = self.rebuild()
+        self.assertEqual(result.pages.rendered, [
+            (os.path.join(self.content, "blog", "post.md"), os.path.join(self.public, "blog", "post.html")),
+        ])
+        self.assertEqual(
+            self.read(os.path.join(self.public, "blog", "post.html")),
+            "<title>Edited post</title><div><h1>Edited post</h1></div>",
+        )
+        # The build records followed, so an incremental build has nothing left to do
+        self.assertEqual(self.site.build().pages.rendered, [])
+
+    def test_template_change_rebuilds_every_page(self):
+        self.write(self.template, "<h1>{{ Title }}</h1>")
+        self.assertEqual(len(self.rebuild().pages.changed), 2)
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "<h1>Home</h1>")
+
+    def test_partial_change_rebuilds_dependents(self):
+        partial = os.path.join(self.root, "footer.html")
+        blog_template = os.path.join(self.content, "blog", "template.html")
+        post_html = os.path.join(self.public, "blog", "post.html")
+        self.write(partial, "<footer></footer>")
+        self.write(blog_template, "<h1>{{ Title }}</h1>{{> ../../footer.html }}")
+        self.assertEqual(self.rebuild().pages.changed, [post_html])
+        self.assertIn(partial, self.watcher.paths)
+        self.write(partial, "<footer>new</footer>")
+        self.assertEqual(self.rebuild().pages.changed, [post_html])
+        self.assertEqual(self.read(post_html), "<h1>Post</h1><footer>new</footer>")
+        os.remove(blog_template)
+        self.assertEqual(self.rebuild().pages.changed, [post_html])
+        self.assertEqual(self.read(post_html), "<title>Post</title><div><h1>Post</h1></div>")
+
+    def test_static_and_removed_files(self):
+        logo = os.path.join(self.static, "images", "logo.svg")
+        self.write(logo, "<svg>new</svg>")
+        self.rebuild()
+        self.assertEqual(self.read(os.path.join(self.public, "images", "logo.svg")), "<svg>new</svg>")
+        os.remove(logo)
+        os.remove(os.path.join(self.content, "index.md"))
+        result = self.rebuild()
+        self.assertEqual(result.pages.removed, [os.path.join(self.public, "index.html")])
+        self.assertEqual(result.static.removed, [os.path.join(self.public, "images", "logo.svg")])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_static_copy_replaces_linked_file(self):
+        # A retained staged build hardlinked to the output keeps its content
+        logo = os.path.join(self.static, "images", "logo.svg")
+        dest = os.path.join(self.public, "images", "logo.svg")
+        retained = os.path.join(self.root, "retained.svg")
+        os.link(dest, retained)
+        self.write(logo, "<svg>new</svg>")
+        self.rebuild()
+        self.assertEqual(self.read(dest), "<svg>new</svg>")
+        self.assertEqual(self.read(retained), "<svg></svg>")
+
+
+class TestReloadBroadcaster(unittest.TestCase):
+
+    def test_wait_wakes_on_notify(self):
+        broadcaster = ReloadBroadcaster()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(broadcaster.wait(0, timeout=5)))
+        waiter.start()
+        broadcaster.notify()
+        waiter.join()
+        self.assertEqual(results, [1])
+
+    def test_wait_times_out(self):
+        self.assertEqual(ReloadBroadcaster().wait(0, timeout=0.01), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,23 @@
+import io
+import os
+import shutil
+import tempfile
 import unittest
 
+import mdblock
+
 from mdblock import (
+    BlockMemo,
     BlockType,
     MDFlatBlock,
     block_to_block_type,
+    block_to_block_type_chained,
+    disable_block_memo,
+    enable_block_memo,
+    generate_page,
     markdown_to_blocks,
-    markdown_to_html_node
+    markdown_to_html_node,
+    read_blocks
 )
 
 
@@ -88,6 +100,17 @@ This is the same paragraph on a new line
         block = "paragraph"
         self.assertEqual(block_to_block_type(block), BlockType.PARA)
 
+    def test_matches_chained_classifier(self):
+        blocks = [
+            "", "#", "####### seven", "#no space", "```", "```\ncode", "`` ```",
+            ">", "> a\nb", "> a\n>b", "* a\n- b", "* a\n*b", "*not a list*", "-- a",
+            "1. a", "1.a", "1. a\n3. b", "2. a", "1. a\n2. b\n3. c", "1. a\n* b", "10. a",
+            "\n  * padded\n* list  \n",
+        ]
+        for block in blocks:
+            with self.subTest(block=block):
+                self.assertEqual(block_to_block_type(block), block_to_block_type_chained(block))
+
     def test_paragraph(self):
         md = """
 This is **bolded** paragraph
@@ -187,6 +210,61 @@ this is paragraph text
             "<div><blockquote>This is a blockquote block</blockquote><p>this is paragraph text</p></div>",
         )
 
+class TestBlockMemo(unittest.TestCase):
+
+    def tearDown(self):
+        disable_block_memo()
+
+    def test_memoized_output_matches(self):
+        md = "# Title\n\nSome **bold** text\n\n- one\n- two\n\n```\ncode\n```\n\nSome **bold** text"
+        expected = markdown_to_html_node(md).to_html()
+        memo = enable_block_memo()
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual((memo.hits, memo.misses), (6, 4))
+        self.assertEqual(memo.hit_rate(), 0.6)
+
+    def test_evicts_least_recently_used(self):
+        memo = BlockMemo(max_entries=2)
+        memo.render("a")
+        memo.render("b")
+        memo.render("a")
+        memo.render("c")
+        self.assertEqual(list(memo.fragments), ["a", "c"])
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.template = os.path.join(self.root, "template.html")
+        self.source = os.path.join(self.root, "index.md")
+        with open(self.template, 'w') as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        with open(self.source, 'w') as file:
+            file.write("Intro\n\n\n# Big *page*\n\n* one\n* two\n\n```\ncode\n\n\n```\n")
+
+    def tearDown(self):
+        mdblock.STREAM_MIN_BYTES = 4 * 1024 * 1024
+        shutil.rmtree(self.root)
+
+    def generate(self, dest):
+        generate_page(self.source, self.template, dest)
+        with open(dest, 'r') as file:
+            return file.read()
+
+    def test_read_blocks_matches_markdown_to_blocks(self):
+        texts = ["", "\n\n", "a", "a\nb", "a\n\nb", "\n\na\n\n\n\nb\n", "a\n \nb", " a \n\n\t\n\n b", "a\n\n"]
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(list(read_blocks(io.StringIO(text))), markdown_to_blocks(text))
+
+    def test_streamed_page_matches(self):
+        expected = self.generate(os.path.join(self.root, "in_memory.html"))
+        mdblock.STREAM_MIN_BYTES = 0
+        self.assertEqual(self.generate(os.path.join(self.root, "streamed.html")), expected)
+
+
 
 if __name__ == "__main__":
     unittest.main()
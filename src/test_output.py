@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from output import (
+    AtomicOutput,
+    same_content,
+    write_if_changed
+)
+
+
+class TestAtomicOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "index.html")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def read(self):
+        with open(self.path, 'r') as file:
+            return file.read()
+
+    def test_identical_write_is_skipped(self):
+        self.assertTrue(write_if_changed(self.path, "<p>Hi</p>"))
+        os.utime(self.path, ns=(0, 0))
+        self.assertFalse(write_if_changed(self.path, "<p>Hi</p>"))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+        self.assertEqual(os.listdir(self.root), ["index.html"])
+
+    def test_changed_write_replaces_file(self):
+        write_if_changed(self.path, "<p>Hi</p>")
+        inode = os.stat(self.path).st_ino
+        self.assertTrue(write_if_changed(self.path, "<p>Ho</p>"))
+        self.assertEqual(self.read(), "<p>Ho</p>")
+        self.assertNotEqual(os.stat(self.path).st_ino, inode)
+
+    def test_failed_write_keeps_old_file(self):
+        write_if_changed(self.path, "old")
+        with self.assertRaises(RuntimeError):
+            with AtomicOutput(self.path) as output_file:
+                output_file.write("partial")
+                raise RuntimeError("render failed")
+        self.assertEqual(self.read(), "old")
+        self.assertEqual(os.listdir(self.root), ["index.html"])
+
+    def test_same_content(self):
+        other = os.path.join(self.root, "other.html")
+        write_if_changed(self.path, "a" * 100000)
+        write_if_changed(other, "a" * 99999 + "b")
+        self.assertFalse(same_content(self.path, other))
+        self.assertFalse(same_content(self.path, os.path.join(self.root, "missing.html")))
+        self.assertTrue(same_content(self.path, self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pageindex import (
+    PageIndex,
+    page_url,
+    render_atom,
+    render_sitemap
+)
+
+
+class TestPageIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "pages.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_modified_only_moves_with_content(self):
+        with PageIndex(self.path) as index:
+            self.assertTrue(index.update("blog/post.html", "content/blog/post.md", "Post", 10, "a", now=100))
+            self.assertFalse(index.update("blog/post.html", "content/blog/post.md", "Post", 10, "a", now=200))
+            self.assertTrue(index.update("blog/post.html", "content/blog/post.md", "Renamed", 10, "a", now=300))
+            self.assertEqual(index.pages(), [("blog/post.html", "Renamed", 100, 100)])
+        # Reopened from disk
+        with PageIndex(self.path) as index:
+            self.assertFalse(index.changed)
+            index.update("blog/post.html", "content/blog/post.md", "Renamed", 12, "b", now=400)
+            index.update("index.html", "content/index.md", "Home", 5, "c", now=500)
+            self.assertEqual(index.pages(), [("blog/post.html", "Renamed", 100, 400), ("index.html", "Home", 500, 500)])
+            self.assertEqual(index.remove(["blog/post.html", "missing.html"]), 1)
+            self.assertEqual(index.paths(), {"index.html"})
+
+    def test_feeds(self):
+        self.assertEqual(page_url("index.html", "https://example.com/"), "https://example.com/")
+        self.assertEqual(page_url("blog/index.html", "https://example.com"), "https://example.com/blog/")
+        pages = [("blog/post.html", "Fish & Chips", 0, 86400)]
+        self.assertIn(
+            "<url><loc>https://example.com/blog/post.html</loc><lastmod>1970-01-02T00:00:00+00:00</lastmod></url>",
+            render_sitemap(pages, "https://example.com"),
+        )
+        feed = render_atom(pages, "https://example.com", "Site")
+        self.assertIn("<title>Fish &amp; Chips</title>", feed)
+        self.assertIn("<author><name>Site</name></author>", feed)
+        feed = render_atom(pages, "https://example.com", "Site", "A & B")
+        self.assertIn("<author><name>A &amp; B</name></author>", feed)
+        self.assertIn("<updated>1970-01-02T00:00:00+00:00</updated>", feed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from output import write_if_changed
+from release import (
+    prepare_stage,
+    publish_stage,
+    remove_stages,
+    stage_dirs
+)
+
+
+class TestStagedRelease(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.public = os.path.join(self.root, "public")
+        os.makedirs(os.path.join(self.public, "blog"))
+        self.write(os.path.join(self.public, "index.html"), "home")
+        self.write(os.path.join(self.public, "blog", "post.html"), "post")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def read(self, path):
+        with open(path, 'r') as file:
+            return file.read()
+
+    def test_stage_links_previous_build(self):
+        stage = prepare_stage(self.public, link_previous=True)
+        post = os.path.join(stage, "blog", "post.html")
+        self.assertTrue(os.path.samefile(post, os.path.join(self.public, "blog", "post.html")))
+        write_if_changed(post, "edited")
+        self.assertEqual(self.read(os.path.join(self.public, "blog", "post.html")), "post")
+        self.assertEqual(os.listdir(prepare_stage(self.public)), [])
+
+    def test_publish_swaps_symlink(self):
+        first = prepare_stage(self.public, link_previous=True)
+        publish_stage(first, self.public)
+        self.assertEqual(os.readlink(self.public), os.path.basename(first))
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "home")
+        second = prepare_stage(self.public, link_previous=True)
+        third = prepare_stage(self.public, link_previous=True)
+        write_if_changed(os.path.join(third, "index.html"), "new home")
+        publish_stage(third, self.public)
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "new home")
+        # The build it replaced is kept, older ones are removed
+        self.assertEqual(stage_dirs(self.public), [second, third])
+        self.assertEqual(sorted(os.listdir(self.root)), sorted(["public", os.path.basename(second), os.path.basename(third)]))
+
+    def test_remove_stages(self):
+        publish_stage(prepare_stage(self.public), self.public)
+        remove_stages(self.public)
+        self.assertEqual(os.listdir(self.root), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from manifest import HashCache
+from scan import (
+    SiteScan,
+    scan_tree
+)
+
+
+class TestScan(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        for path in ("a-b.md", os.path.join("a", "x.md"), "index.md", os.path.join("a", "notes.txt")):
+            self.write(os.path.join(self.content, path), "# Page")
+        self.write(os.path.join(self.static, "css", "index.css"), "body {}")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def test_scan_tree_walk_order(self):
+        files = scan_tree(self.content)
+        self.assertEqual(
+            list(files),
+            [os.path.join("a", "notes.txt"), os.path.join("a", "x.md"), "a-b.md", "index.md"],
+        )
+        self.assertEqual(files["index.md"].st_size, 6)
+        self.assertEqual(scan_tree(os.path.join(self.root, "missing")), {})
+
+    def test_site_scan(self):
+        scan = SiteScan(self.content, self.static, "public")
+        self.assertEqual(
+            scan.page_jobs,
+            [
+                (os.path.join(self.content, "a", "x.md"), os.path.join("public", "a", "x.html")),
+                (os.path.join(self.content, "a-b.md"), os.path.join("public", "a-b.html")),
+                (os.path.join(self.content, "index.md"), os.path.join("public", "index.html")),
+            ],
+        )
+        self.assertEqual(list(scan.static), [os.path.join("css", "index.css")])
+        self.assertIn(os.path.join(self.content, "a", "x.md"), scan.stats)
+
+    def test_hash_cache_reuses_unchanged_files(self):
+        path = os.path.join(self.content, "index.md")
+        first = HashCache()
+        digest = first.hash(path)
+        stat = os.stat(path)
+        # A hash recorded for the same mtime and size is trusted without reading the file
+        cached = HashCache({path: [stat.st_mtime_ns, stat.st_size, "recorded"]})
+        self.assertEqual(cached.hash(path), "recorded")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertEqual(HashCache(cached.used).hash(path), digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from search import (
+    SEARCH_DIR,
+    SearchIndexReader,
+    SearchIndexWriter,
+    ShardReader,
+    encode_shard,
+    page_terms,
+    shard_key,
+    tokenize
+)
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.public = os.path.join(self.root, "public")
+        self.state = os.path.join(self.root, ".build", "search.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_page_terms(self):
+        path = os.path.join(self.root, "page.md")
+        with open(path, 'w') as file:
+            file.write("# Fish & Chips\n\n- **Crispy** fish\n- [chips](/chips.html)\n\n> Fry the *fish*")
+        title, terms = page_terms(path)
+        self.assertEqual(title, "Fish & Chips")
+        self.assertEqual(terms, {"fish": 3, "chips": 2, "crispy": 1, "fry": 1, "the": 1})
+        self.assertEqual(tokenize("Ünïcode a b2"), ["ünïcode", "b2"])
+
+    def test_shard_round_trip(self):
+        postings = {"fish": {3: 1, 300: 2}, "fig": {1: 4}, "fisher": {200000: 1}}
+        reader = ShardReader(encode_shard(postings))
+        self.assertEqual(reader.to_postings(), postings)
+        self.assertEqual(reader.lookup("fish"), {3: 1, 300: 2})
+        self.assertEqual(reader.lookup("fis"), {})
+        self.assertEqual([term for term, _ in reader.with_prefix("fis")], ["fish", "fisher"])
+
+    def test_incremental_updates(self):
+        writer = SearchIndexWriter(self.public, self.state)
+        writer.update("index.html", "Home", {"fish": 1, "home": 2})
+        writer.update("blog/post.html", "Post", {"fish": 3, "chips": 1})
+        writer.save()
+        reader = SearchIndexReader(os.path.join(self.public, SEARCH_DIR))
+        results, total = reader.search("fish")
+        self.assertEqual(total, 2)
+        self.assertEqual([result["url"] for result in results], ["/blog/post.html", "/"])
+        self.assertEqual([result["title"] for result in reader.search("fish chi")[0]], ["Post"])
+
+        # Reloaded from its state, only the shards of the changed terms are rewritten
+        writer = SearchIndexWriter(self.public, self.state)
+        writer.update("index.html", "Home", {"fish": 1, "home": 2})
+        self.assertEqual(writer.save(), 0)
+        writer.remove("blog/post.html")
+        writer.update("index.html", "Home", {"fish": 1, "home": 2, "chips": 1})
+        self.assertEqual(writer.save(), 2)      # The "fi" and "ch" shards
+        self.assertEqual(reader.search("chips")[0][0]["url"], "/")
+        self.assertEqual(reader.search("fish")[1], 1)
+        self.assertEqual(reader.search("nothing"), ([], 0))
+        with self.assertRaises(ValueError):
+            reader.search("fish", limit=-1)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.public, SEARCH_DIR))),
+            sorted(["docs.json", shard_key("chips") + ".idx", shard_key("fish") + ".idx", shard_key("home") + ".idx"]),
+        )
+
+    def test_fresh_index_only_replaces_its_own_files(self):
+        search_dir = os.path.join(self.public, SEARCH_DIR)
+        os.makedirs(search_dir)
+        with open(os.path.join(search_dir, "stale.idx"), 'w') as file:
+            file.write("")
+        with open(os.path.join(search_dir, "README"), 'w') as file:
+            file.write("")
+        writer = SearchIndexWriter(self.public, self.state)
+        writer.update("index.html", "Home", {"home": 1})
+        writer.save()
+        self.assertEqual(sorted(os.listdir(search_dir)), sorted(["README", "docs.json", shard_key("home") + ".idx"]))
+
+    def test_missing_index(self):
+        self.assertEqual(SearchIndexReader(os.path.join(self.public, SEARCH_DIR)).search("fish"), ([], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
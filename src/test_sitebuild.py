@@ -0,0 +1,214 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from mdblock import active_block_memo
+from search import (
+    SEARCH_DIR,
+    SearchIndexReader
+)
+from sitebuild import (
+    Site,
+    SiteConfig,
+    render_markdown
+)
+
+
+class TestSiteBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(os.path.join(self.root, "static"))
+        self.write(os.path.join(self.root, "template.html"), "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.root, "static", "index.css"), "body {}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nSome *text*")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def config(self, **options):
+        return SiteConfig(
+            content_dir=self.content,
+            static_dir=os.path.join(self.root, "static"),
+            template_path=os.path.join(self.root, "template.html"),
+            target_dir=self.public,
+            state_dir=os.path.join(self.root, ".build"),
+            **options
+        )
+
+    def test_repeated_incremental_builds(self):
+        site = Site(self.config(incremental=True, memo_blocks=64))
+        first = site.build()
+        self.assertTrue(first.ok)
+        self.assertEqual(len(first.pages.rendered), 2)
+        self.assertEqual(first.static.copied, [os.path.join(self.public, "index.css")])
+        self.assertIn("scan", first.timings)
+
+        self.assertEqual(site.build().pages.rendered, [])
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome back")
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        third = site.build()
+        self.assertEqual(third.pages.changed, [os.path.join(self.public, "index.html")])
+        self.assertEqual(third.pages.removed, [os.path.join(self.public, "blog", "post.html")])
+
+    def test_block_memo_stays_with_its_site(self):
+        first = Site(self.config(memo_blocks=8))
+        second = Site(self.config(memo_blocks=16))
+        first.build()
+        self.assertIsNone(active_block_memo())
+        self.assertEqual(first.memo.misses, 4)
+        second.build()
+        self.assertEqual((first.memo.misses, second.memo.misses), (4, 4))
+        render_markdown("# Home")
+        Site(self.config()).build()
+        self.assertEqual((first.memo.hits + first.memo.misses, second.memo.hits + second.memo.misses), (4, 4))
+
+    def test_rebuild_paths(self):
+        site = Site(self.config(incremental=True))
+        site.build()
+        index = os.path.join(self.content, "index.md")
+        self.write(index, "# Home\n\nEdited")
+        result = site.rebuild([index])
+        self.assertEqual(result.pages.changed, [os.path.join(self.public, "index.html")])
+
+        # A template change reaches every page that uses it, found from the last build's graph
+        self.write(os.path.join(self.root, "template.html"), "<h1>{{ Title }}</h1>{{ Content }}")
+        result = site.rebuild([os.path.join(self.root, "template.html")])
+        self.assertEqual(len(result.pages.changed), 2)
+
+        post = os.path.join(self.content, "blog", "post.md")
+        os.remove(post)
+        self.write(os.path.join(self.content, "new.md"), "# New")
+        self.write(os.path.join(self.root, "static", "site.js"), "")
+        result = site.rebuild([post, os.path.join(self.content, "new.md"), os.path.join(self.root, "static", "site.js")])
+        self.assertEqual(result.pages.removed, [os.path.join(self.public, "blog", "post.html")])
+        self.assertEqual(result.pages.changed, [os.path.join(self.public, "new.html")])
+        self.assertEqual(result.static.copied, [os.path.join(self.public, "site.js")])
+        # The graph on disk matches what a fresh build would find
+        self.assertEqual(Site(self.config(incremental=True)).build().pages.rendered, [])
+
+    def test_build_records_belong_to_one_output(self):
+        Site(self.config(incremental=True, search=True)).build()
+        preview = os.path.join(self.root, "preview")
+        index = os.path.join(self.content, "index.md")
+        self.write(index, "# Edited\n\nFarewell")
+        other = Site(SiteConfig(
+            content_dir=self.content,
+            static_dir=os.path.join(self.root, "static"),
+            template_path=os.path.join(self.root, "template.html"),
+            target_dir=preview,
+            state_dir=os.path.join(self.root, ".build"),
+            incremental=True,
+            search=True,
+        ))
+        self.assertEqual(len(other.rebuild([index]).pages.rendered), 2)
+        result = Site(self.config(incremental=True, search=True)).build()
+        self.assertEqual(len(result.pages.rendered), 2)
+        with open(os.path.join(self.public, "index.html"), 'r') as file:
+            self.assertIn("<h1>Edited</h1>", file.read())
+        reader = SearchIndexReader(os.path.join(self.public, SEARCH_DIR))
+        self.assertEqual(len(reader.search("farewell")[0]), 1)
+
+    def test_rebuild_keeps_compressed_variants_current(self):
+        index = os.path.join(self.content, "index.md")
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write(index, "# Home\n\n" + "Welcome " * 50)
+        self.write(post, "# Post\n\n" + "Some *text* " * 50)
+        site = Site(self.config(incremental=True, compress=True))
+        site.build()
+        self.write(index, "# Home\n\n" + "Welcome back " * 50)
+        self.assertGreater(site.rebuild([index]).compressed, 0)
+        with gzip.open(os.path.join(self.public, "index.html.gz"), 'rt') as file:
+            self.assertIn("Welcome back", file.read())
+        os.remove(post)
+        site.rebuild([post])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+
+    def test_sitemap_and_feed(self):
+        site = Site(self.config(incremental=True, site_url="https://example.com"))
+        first = site.build()
+        sitemap = os.path.join(self.public, "sitemap.xml")
+        self.assertEqual(first.feeds, [sitemap, os.path.join(self.public, "feed.xml")])
+        with open(sitemap, 'r') as file:
+            text = file.read()
+        self.assertIn("<loc>https://example.com/</loc>", text)
+        self.assertIn("<loc>https://example.com/blog/post.html</loc>", text)
+
+        self.assertEqual(site.build().feeds, [])
+        post = os.path.join(self.content, "blog", "post.md")
+        os.remove(post)
+        self.assertEqual(len(site.rebuild([post]).feeds), 2)
+        with open(sitemap, 'r') as file:
+            self.assertNotIn("post.html", file.read())
+
+    def test_search_index(self):
+        site = Site(self.config(incremental=True, search=True))
+        self.assertGreater(site.build().search_shards, 0)
+        reader = SearchIndexReader(os.path.join(self.public, SEARCH_DIR))
+        self.assertEqual([result["url"] for result in reader.search("welcome")[0]], ["/"])
+        self.assertEqual(site.build().search_shards, 0)
+
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write(post, "# Post\n\nWelcome too")
+        self.assertEqual(site.rebuild([post]).search_shards, 4)     # "we" and "to" gain it, "so" and "te" lose it
+        self.assertEqual(len(reader.search("welcome")[0]), 2)
+        self.assertEqual(reader.search("text"), ([], 0))
+
+    def test_search_index_directory_is_reserved(self):
+        self.write(os.path.join(self.content, "search.md"), "# Search\n\nFind pages")
+        os.makedirs(os.path.join(self.content, "search"))
+        self.write(os.path.join(self.content, "search", "index.md"), "# Search help")
+        site = Site(self.config(incremental=True, search=True))
+        site.build()
+        self.assertTrue(os.path.exists(os.path.join(self.public, "search.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "search", "index.html")))
+
+        page = os.path.join(self.content, SEARCH_DIR, "index.md")
+        os.makedirs(os.path.dirname(page))
+        self.write(page, "# Clash")
+        with self.assertRaises(Exception):
+            site.rebuild([page])
+        with self.assertRaises(Exception):
+            site.build()
+        self.assertFalse(os.path.exists(os.path.join(self.public, SEARCH_DIR, "index.html")))
+
+    def test_errors_are_returned(self):
+        broken = os.path.join(self.content, "broken.md")
+        with open(broken, 'wb') as file:
+            file.write(b"# Broken \xff")
+        result = Site(self.config()).build()
+        self.assertFalse(result.ok)
+        self.assertEqual([source for source, _ in result.errors], [broken])
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_failed_staged_build_is_not_published(self):
+        site = Site(self.config(staged=True))
+        self.assertIsNotNone(site.build().published)
+        with open(os.path.join(self.content, "broken.md"), 'wb') as file:
+            file.write(b"# Broken \xff")
+        result = site.build()
+        self.assertFalse(result.ok)
+        self.assertIsNone(result.published)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "broken.html")))
+
+    def test_render_markdown(self):
+        self.assertEqual(
+            render_markdown("# Title\n\nSome **bold** text"),
+            "<div><h1>Title</h1><p>Some <b>bold</b> text</p></div>",
+        )
+        page = Site(self.config()).render_page("# Title\n\nBody")
+        self.assertEqual(page, "<title>Title</title><div><h1>Title</h1><p>Body</p></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
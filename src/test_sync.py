@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sync import (
+    load_synced_files,
+    save_synced_files,
+    sync_dir
+)
+
+
+class TestSyncDir(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.static = os.path.join(self.root, "static")
+        self.public = os.path.join(self.root, "public")
+        os.makedirs(os.path.join(self.static, "images", "icons"))
+        os.makedirs(self.public)
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "aaaa")
+        self.write(os.path.join(self.static, "images", "icons", "b.svg"), "<svg/>")
+        self.write(os.path.join(self.public, "index.html"), "<p>generated page</p>")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def read(self, path):
+        with open(path, 'r') as file:
+            return file.read()
+
+    def test_first_sync_copies_everything(self):
+        report = sync_dir(self.static, self.public)
+        self.assertEqual(len(report.copied), 3)
+        self.assertEqual(report.skipped, 0)
+        self.assertEqual(report.files, sorted([
+            "index.css",
+            os.path.join("images", "a.png"),
+            os.path.join("images", "icons", "b.svg"),
+        ]))
+        self.assertEqual(self.read(os.path.join(self.public, "images", "icons", "b.svg")), "<svg/>")
+
+    def test_unchanged_files_are_skipped(self):
+        first = sync_dir(self.static, self.public)
+        self.write(os.path.join(self.static, "index.css"), "body { color: red; }")
+        report = sync_dir(self.static, self.public, first.files)
+        self.assertEqual(report.copied, [os.path.join(self.public, "index.css")])
+        self.assertEqual(report.skipped, 2)
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body { color: red; }")
+
+    def test_stale_files_are_removed(self):
+        first = sync_dir(self.static, self.public)
+        shutil.rmtree(os.path.join(self.static, "images", "icons"))
+        report = sync_dir(self.static, self.public, first.files)
+        self.assertEqual(report.removed, [os.path.join(self.public, "images", "icons", "b.svg")])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images", "icons")))
+        # Generated pages were never synced, so they are left alone
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_hardlink(self):
+        sync_dir(self.static, self.public, hardlink=True)
+        source = os.stat(os.path.join(self.static, "index.css"))
+        dest = os.stat(os.path.join(self.public, "index.css"))
+        self.assertEqual(source.st_ino, dest.st_ino)
+        self.assertEqual(sync_dir(self.static, self.public, hardlink=True).skipped, 3)
+
+    def test_synced_files_round_trip(self):
+        path = os.path.join(self.root, ".build", "static.json")
+        self.assertEqual(load_synced_files(path), [])
+        save_synced_files(path, ["index.css"])
+        self.assertEqual(load_synced_files(path), ["index.css"])
+
+
+if __name__ == "__main__":
+    unittest.main()
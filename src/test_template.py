@@ -0,0 +1,106 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from htmlnode import (
+    LeafNode,
+    ParentNode
+)
+from template import (
+    Template,
+    load_template
+)
+
+
+class TestTemplate(unittest.TestCase):
+
+    def test_segments_and_slots(self):
+        template = Template("<title> {{ Title }} </title><body>{{Content}}</body>")
+        self.assertEqual(template.segments, ["<title> ", " </title><body>", "</body>"])
+        self.assertEqual([name for name, _ in template.slots], ["Title", "Content"])
+
+    def test_render(self):
+        template = Template("<title> {{ Title }} </title>{{ Content }}")
+        html = template.render({"Title": "Home", "Content": "<p>Hi</p>"})
+        self.assertEqual(html, "<title> Home </title><p>Hi</p>")
+
+    def test_render_arbitrary_fields(self):
+        template = Template("{{ Title }} by {{ Author }} on {{ Date }}")
+        html = template.render({"Title": "Post", "Author": "Ana", "Date": "2024-06-24"})
+        self.assertEqual(html, "Post by Ana on 2024-06-24")
+
+    def test_missing_field_keeps_placeholder(self):
+        template = Template("{{ Title }}|{{ Unknown }}")
+        self.assertEqual(template.render({"Title": "A"}), "A|{{ Unknown }}")
+
+    def test_repeated_slot(self):
+        template = Template("{{ Title }} - {{ Title }}")
+        self.assertEqual(template.render({"Title": "A"}), "A - A")
+
+    def test_write_streams_nodes(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}{{ Footer }}")
+        content = ParentNode("div", [LeafNode("p", "Hi")])
+        stream = io.StringIO()
+        template.write(stream, {"Title": "Home", "Content": content})
+        self.assertEqual(stream.getvalue(), "<title>Home</title><div><p>Hi</p></div>{{ Footer }}")
+
+    def test_no_slots(self):
+        self.assertEqual(Template("plain").render({}), "plain")
+
+
+class TestLoadTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "template.html")
+        with open(self.path, 'w') as file:
+            file.write("<h1>{{ Title }}</h1>")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_compiled_once(self):
+        self.assertIs(load_template(self.path), load_template(self.path))
+
+    def test_recompiled_when_file_changes(self):
+        first = load_template(self.path)
+        with open(self.path, 'w') as file:
+            file.write("<h2>{{ Title }}</h2>!")
+        second = load_template(self.path)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.render({"Title": "A"}), "<h2>A</h2>!")
+
+    def write_partial(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+        return path
+
+    def test_includes_partials(self):
+        header = self.write_partial(os.path.join("partials", "header.html"), "<header>{{> nav.html }}</header>")
+        nav = self.write_partial(os.path.join("partials", "nav.html"), "<nav>{{ Title }}</nav>")
+        self.write_partial("template.html", "{{> partials/header.html }}{{ Content }}")
+        template = load_template(self.path)
+        self.assertEqual(template.render({"Title": "A", "Content": "B"}), "<header><nav>A</nav></header>B")
+        self.assertEqual(template.dependencies, [self.path, header, nav])
+
+    def test_recompiled_when_partial_changes(self):
+        self.write_partial("footer.html", "<footer>1</footer>")
+        self.write_partial("template.html", "{{ Content }}{{>footer.html}}")
+        first = load_template(self.path)
+        self.write_partial("footer.html", "<footer>2</footer>!")
+        self.assertEqual(load_template(self.path).render({"Content": ""}), "<footer>2</footer>!")
+        self.assertIsNot(first, load_template(self.path))
+
+    def test_include_cycle(self):
+        self.write_partial("a.html", "{{> template.html }}")
+        self.write_partial("template.html", "{{> a.html }}")
+        with self.assertRaises(ValueError):
+            load_template(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
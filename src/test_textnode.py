@@ -9,6 +9,7 @@ from textnode import (
     split_nodes_images,
     split_nodes_links,
     text_to_textnodes,
+    text_to_textnodes_multipass,
 )
 
 from mdblock import (
@@ -258,6 +259,25 @@ class TestTextToTextNodes(unittest.TestCase):
         ]
         self.assertEqual(actual_nodes, expected)
 
+    def test_matches_multipass(self):
+        texts = [
+            "",
+            "plain text",
+            "**bold** at start and *italic* at end*",
+            "***both*** and **unclosed",
+            "*italic with `code` inside* and `code with *star*`",
+            "**bold with *star* and `tick`**",
+            "![](empty.png) and ![alt](a.png)![b](b.png)",
+            "[link](http://a.com) then ![img](b.png) then [x](y) tail",
+            "**[bold link](http://a.com)** and *![italic image](i.png)*",
+            "!![a](b) [c](d ![e](f))",
+            "`code [link](url)` and [broken](link",
+            "line one\nline **two**\n* not a list",
+        ]
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(text_to_textnodes(text), text_to_textnodes_multipass(text))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -12,35 +12,40 @@ class TextType(Enum):
     IMAGE = "image"
 
 
+IMAGE_PATTERN = re.compile(r"!\[(.*?)\]\((.*?)\)")
+LINK_PATTERN = re.compile(r"(?<!\!)\[(.*?)\]\((.*?)\)")
+INLINE_DELIMITER_PATTERN = re.compile(r"\*\*|\*|`")
+
+
 def extract_markdown_images(text):
-    pattern = r"!\[(.*?)\]\((.*?)\)"
-    matches = re.findall(pattern, text)
+    matches = IMAGE_PATTERN.findall(text)
     return matches
 
 
 def extract_markdown_links(text):
-    pattern = r"(?<!\!)\[(.*?)\]\((.*?)\)"
-    matches = re.findall(pattern, text)
+    matches = LINK_PATTERN.findall(text)
     return matches
 
 
+def split_text_on_pattern(text, text_type, url, pattern, match_type, new_nodes):
+    # Behaves like splitting on each "[text](url)" match in turn: the text before a match
+    # is always kept, even when empty, and the text after the last one only if it is not
+    position = 0
+    for match in pattern.finditer(text):
+        new_nodes.append(TextNode(text[position:match.start()], text_type))
+        new_nodes.append(TextNode(match.group(1), match_type, match.group(2)))
+        position = match.end()
+    if position == 0:
+        new_nodes.append(TextNode(text, text_type, url))
+    elif position < len(text):
+        new_nodes.append(TextNode(text[position:], text_type))
+
+
 def split_nodes_images(old_nodes):
     new_nodes = []
     for old_node in old_nodes:
         if old_node.text != None and old_node.text != "":
-            image_tups = extract_markdown_images(old_node.text)
-            if image_tups != []:
-                text_to_split = old_node.text
-                for image_tup in image_tups:
-                    segments = text_to_split.split(f"![{image_tup[0]}]({image_tup[1]})", 1)
-                    new_nodes.append(TextNode(segments[0], old_node.text_type))
-                    new_nodes.append(TextNode(image_tup[0], TextType.IMAGE, image_tup[1]))
-                    if len(segments) > 1 and segments[1] != "":
-                        text_to_split = segments[1]
-                if len(segments) > 1 and segments[1] != "":
-                    new_nodes.append(TextNode(segments[1], old_node.text_type))
-            else:
-                new_nodes.append(TextNode(old_node.text, old_node.text_type, old_node.url))
+            split_text_on_pattern(old_node.text, old_node.text_type, old_node.url, IMAGE_PATTERN, TextType.IMAGE, new_nodes)
     return new_nodes
 
 
@@ -48,19 +53,7 @@ def split_nodes_links(old_nodes):
     new_nodes = []
     for old_node in old_nodes:
         if old_node.text != None and old_node.text != "":
-            link_tups = extract_markdown_links(old_node.text)
-            if link_tups != []:
-                text_to_split = old_node.text
-                for link_tup in link_tups:
-                    segments = text_to_split.split(f"[{link_tup[0]}]({link_tup[1]})", 1)
-                    new_nodes.append(TextNode(segments[0], old_node.text_type))
-                    new_nodes.append(TextNode(link_tup[0], TextType.LINK, link_tup[1]))
-                    if len(segments) > 1 and segments[1] != "":
-                        text_to_split = segments[1]
-                if len(segments) > 1 and segments[1] != "":
-                    new_nodes.append(TextNode(segments[1], old_node.text_type))
-            else:
-                new_nodes.append(TextNode(old_node.text, old_node.text_type, old_node.url))
+            split_text_on_pattern(old_node.text, old_node.text_type, old_node.url, LINK_PATTERN, TextType.LINK, new_nodes)
     return new_nodes
 
 
@@ -99,12 +92,62 @@ def textnode_to_html_node(text_node):
     raise Exception("Unsupported TextNode type")
 
 
+def append_inline_segment(nodes, text, text_type):
+    # Resolves images, then links, inside a segment bounded by emphasis/code delimiters
+    if text == "":
+        return
+    if "](" not in text:
+        nodes.append(TextNode(text, text_type))
+        return
+    pieces = []
+    split_text_on_pattern(text, text_type, None, IMAGE_PATTERN, TextType.IMAGE, pieces)
+    for piece in pieces:
+        if piece.text != "":
+            split_text_on_pattern(piece.text, piece.text_type, piece.url, LINK_PATTERN, TextType.LINK, nodes)
+
+
+def inline_text_type(bold, italic, code):
+    if bold:
+        return TextType.BOLD
+    if italic:
+        return TextType.ITALIC
+    if code:
+        return TextType.CODE
+    return TextType.TEXT
+
+
 def text_to_textnodes(text):
+    # Single scan over the delimiters. It produces the same nodes as the chained
+    # split_nodes_* passes (see text_to_textnodes_multipass): "**" always toggles bold,
+    # "*" toggles italic outside bold and "`" toggles code outside bold and italic.
+    # Each delimiter also closes the inner states, as each pass only split TEXT nodes
+    nodes = []
+    bold = italic = code = False
+    position = 0
+    for match in INLINE_DELIMITER_PATTERN.finditer(text):
+        delimiter = match.group()
+        if delimiter != "**" and (bold or (italic and delimiter == "`")):
+            continue
+        append_inline_segment(nodes, text[position:match.start()], inline_text_type(bold, italic, code))
+        position = match.end()
+        if delimiter == "**":
+            bold = not bold
+            italic = code = False
+        elif delimiter == "*":
+            italic = not italic
+            code = False
+        else:
+            code = not code
+    append_inline_segment(nodes, text[position:], inline_text_type(bold, italic, code))
+    return nodes
+
+
+def text_to_textnodes_multipass(text):
+    # The original five-pass pipeline, kept as the reference behaviour for text_to_textnodes
     nodes = [TextNode(text, TextType.TEXT)]
     nodes = split_nodes_delimiter(nodes, '**', TextType.BOLD)
     nodes = split_nodes_delimiter(nodes, '*', TextType.ITALIC)
     nodes = split_nodes_delimiter(nodes, '`', TextType.CODE)
-    # import pdb; pdb.set_trace()
     nodes = split_nodes_images(nodes)
     nodes = split_nodes_links(nodes)
     return nodes
@@ -112,6 +155,8 @@ def text_to_textnodes(text):
 
 class TextNode:
 
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type